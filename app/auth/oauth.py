@@ -1,8 +1,8 @@
 from fasthtml.common import *
 from urllib import parse
 from core.config import settings
-from appwrite.services.account import Account
-from core.appwrite_client import create_client
+from core.appwrite_async import AsyncAccount
+from core.appwrite_client import get_user_client
 
 def google_oauth_url(base_url: str) -> str:
     """Build the Google OAuth2 TOKEN redirect URL"""
@@ -32,6 +32,5 @@ async def verify_oauth_token(jwt_token: str) -> dict:
     if not jwt_token:
         raise ValueError("No JWT token provided")
         
-    user_client = create_client(authenticated=False).set_jwt(jwt_token)
-    user = Account(user_client).get()
+    user = await AsyncAccount(get_user_client(jwt_token)).get()
     return {"id": user["$id"], "email": user["email"]}
\ No newline at end of file
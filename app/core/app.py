@@ -1,18 +1,36 @@
 from fasthtml.common import *
 from dotenv import load_dotenv
-from core.static import fetch_static_files
+from core.static import fetch_static_files, serve_asset, asset_manifest, BUILT_CSS
+from starlette.routing import Route
+from starlette.middleware import Middleware
+from core.compression import CompressionMiddleware
+from core.config import settings
+from core.appwrite_client import close_http_client
+from core.coalesce import flush_pending
+from core.sse_manager import sse_manager
+from db.task_db import history_writer
 
 # Load environment variables
 load_dotenv()
 
+# Tailwind and daisyUI: the purged build from `npm run build:css` when it exists
+# (it is served from /assets with the other static files), otherwise the
+# in-browser compiler and full daisyUI from the CDNs for local development
+if asset_manifest.has(BUILT_CSS):
+    style_headers = ()
+else:
+    style_headers = (
+        Script(src='https://unpkg.com/tailwindcss-cdn@3.4.3/tailwindcss.js'),
+        Link(
+            rel='stylesheet',
+            href='https://cdn.jsdelivr.net/npm/daisyui@4.11.1/dist/full.min.css',),
+        Script(src='https://cdn.tailwindcss.com'),
+    )
+
 # Headers setup
 headers = (
     Meta(name="viewport", content="width=device-width, initial-scale=1.0"),
-    Script(src='https://unpkg.com/tailwindcss-cdn@3.4.3/tailwindcss.js'),
-    Link(
-        rel='stylesheet',
-        href='https://cdn.jsdelivr.net/npm/daisyui@4.11.1/dist/full.min.css',),
-    Script(src='https://cdn.tailwindcss.com'),
+    *style_headers,
     Link(
         rel='stylesheet',
         href='https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.6.0/css/all.min.css', 
@@ -48,10 +66,16 @@ skip_auth = [
     r"/assets/.*", 
     r"/oauth.*", 
     r"/login/google", 
-    r"/oauth-token"
+    r"/oauth-token",
+    r"/admin/.*",  # authenticated by the GitHub webhook secret instead
 ]
 
 beforeware = Beforeware(auth_before, skip=skip_auth)
 
 # Create FastHTML app
-app, rt = fast_app(before=beforeware, hdrs=headers)
\ No newline at end of file
+app, rt = fast_app(before=beforeware, hdrs=headers, on_startup=[sse_manager.start],
+                   # Ahead of FastHTML's catch-all static route so fingerprinted names resolve
+                   routes=[Route('/assets/{path:path}', serve_asset)],
+                   middleware=[Middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_SIZE,
+                                          gzip_level=settings.COMPRESSION_GZIP_LEVEL)],
+                   on_shutdown=[flush_pending, history_writer.drain, sse_manager.stop, close_http_client])
\ No newline at end of file
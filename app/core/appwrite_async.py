@@ -0,0 +1,173 @@
+"""
+Async Appwrite REST client built on httpx, mirroring the parts of the
+synchronous appwrite SDK used by the app
+"""
+import json
+from typing import Any, Dict, List, Optional
+import httpx
+from appwrite.exception import AppwriteException
+from appwrite.encoders.value_class_encoder import ValueClassEncoder
+
+
+class AsyncClient:
+    """Async counterpart of appwrite.client.Client"""
+
+    def __init__(self, http: Optional[httpx.AsyncClient] = None):
+        self._http = http
+        self._endpoint = 'https://cloud.appwrite.io/v1'
+        self._global_headers = {
+            'x-sdk-name': 'Python',
+            'x-sdk-platform': 'server',
+            'x-sdk-language': 'python',
+            'X-Appwrite-Response-Format': '1.6.0',
+        }
+
+    def set_endpoint(self, endpoint: str) -> 'AsyncClient':
+        self._endpoint = endpoint
+        return self
+
+    def set_project(self, value: str) -> 'AsyncClient':
+        self._global_headers['x-appwrite-project'] = value
+        return self
+
+    def set_key(self, value: str) -> 'AsyncClient':
+        self._global_headers['x-appwrite-key'] = value
+        return self
+
+    def set_jwt(self, value: str) -> 'AsyncClient':
+        self._global_headers['x-appwrite-jwt'] = value
+        return self
+
+    def flatten(self, data: Any, prefix: str = '') -> Dict[str, Any]:
+        """Flatten nested params into PHP-style keys (queries[0]=...)"""
+        output = {}
+        items = enumerate(data) if isinstance(data, list) else data.items()
+        for key, value in items:
+            final_key = f"{prefix}[{key}]" if prefix else str(key)
+            if isinstance(value, (list, dict)):
+                output.update(self.flatten(value, final_key))
+            else:
+                output[final_key] = value
+        return output
+
+    async def call(self, method: str, path: str = '', params: Optional[Dict[str, Any]] = None) -> Any:
+        """Send a request to the Appwrite REST API and return the decoded response"""
+        params = {k: v for k, v in (params or {}).items() if v is not None}
+        headers = dict(self._global_headers)
+        request_args = {}
+        if method == 'get':
+            request_args['params'] = self.flatten(params)
+        else:
+            headers['content-type'] = 'application/json'
+            request_args['content'] = json.dumps(params, cls=ValueClassEncoder)
+
+        if self._http is not None:
+            response = await self._http.request(method, self._endpoint + path, headers=headers, **request_args)
+        else:
+            async with httpx.AsyncClient() as http:
+                response = await http.request(method, self._endpoint + path, headers=headers, **request_args)
+        return self._parse_response(response)
+
+    @staticmethod
+    def _parse_response(response: httpx.Response) -> Any:
+        is_json = response.headers.get('content-type', '').startswith('application/json')
+        if response.status_code >= 400:
+            if is_json:
+                body = response.json()
+                raise AppwriteException(body.get('message'), response.status_code, body.get('type'), response.text)
+            raise AppwriteException(response.text, response.status_code, None, response.text)
+        return response.json() if is_json else response.content
+
+
+class AsyncService:
+    def __init__(self, client: AsyncClient):
+        self.client = client
+
+
+class AsyncDatabases(AsyncService):
+    """Async counterpart of appwrite.services.databases.Databases"""
+
+    @staticmethod
+    def _documents_path(database_id: str, collection_id: str) -> str:
+        return f'/databases/{database_id}/collections/{collection_id}/documents'
+
+    async def list_documents(self, database_id: str, collection_id: str, queries: List[str] = None) -> Dict[str, Any]:
+        return await self.client.call('get', self._documents_path(database_id, collection_id), {
+            'queries': queries
+        })
+
+    async def get_document(self, database_id: str, collection_id: str, document_id: str, queries: List[str] = None) -> Dict[str, Any]:
+        return await self.client.call('get', f'{self._documents_path(database_id, collection_id)}/{document_id}', {
+            'queries': queries
+        })
+
+    async def create_document(self, database_id: str, collection_id: str, document_id: str, data: dict, permissions: List[str] = None) -> Dict[str, Any]:
+        return await self.client.call('post', self._documents_path(database_id, collection_id), {
+            'documentId': document_id,
+            'data': data,
+            'permissions': permissions
+        })
+
+    async def update_document(self, database_id: str, collection_id: str, document_id: str, data: dict = None, permissions: List[str] = None) -> Dict[str, Any]:
+        return await self.client.call('patch', f'{self._documents_path(database_id, collection_id)}/{document_id}', {
+            'data': data,
+            'permissions': permissions
+        })
+
+    async def delete_document(self, database_id: str, collection_id: str, document_id: str) -> Dict[str, Any]:
+        return await self.client.call('delete', f'{self._documents_path(database_id, collection_id)}/{document_id}')
+
+
+class AsyncUsers(AsyncService):
+    """Async counterpart of appwrite.services.users.Users"""
+
+    async def get(self, user_id: str) -> Dict[str, Any]:
+        return await self.client.call('get', f'/users/{user_id}')
+
+    async def create(self, user_id: str, email: str = None, phone: str = None, password: str = None, name: str = None) -> Dict[str, Any]:
+        return await self.client.call('post', '/users', {
+            'userId': user_id,
+            'email': email,
+            'phone': phone,
+            'password': password,
+            'name': name
+        })
+
+    async def delete(self, user_id: str) -> Dict[str, Any]:
+        return await self.client.call('delete', f'/users/{user_id}')
+
+    async def update_name(self, user_id: str, name: str) -> Dict[str, Any]:
+        return await self.client.call('patch', f'/users/{user_id}/name', {'name': name})
+
+    async def update_email(self, user_id: str, email: str) -> Dict[str, Any]:
+        return await self.client.call('patch', f'/users/{user_id}/email', {'email': email})
+
+    async def update_phone(self, user_id: str, number: str) -> Dict[str, Any]:
+        return await self.client.call('patch', f'/users/{user_id}/phone', {'number': number})
+
+    async def update_labels(self, user_id: str, labels: List[str]) -> Dict[str, Any]:
+        return await self.client.call('put', f'/users/{user_id}/labels', {'labels': labels})
+
+
+class AsyncTeams(AsyncService):
+    """Async counterpart of appwrite.services.teams.Teams"""
+
+    async def list(self, queries: List[str] = None, search: str = None) -> Dict[str, Any]:
+        return await self.client.call('get', '/teams', {'queries': queries, 'search': search})
+
+    async def create(self, team_id: str, name: str, roles: List[str] = None) -> Dict[str, Any]:
+        return await self.client.call('post', '/teams', {'teamId': team_id, 'name': name, 'roles': roles})
+
+    async def create_membership(self, team_id: str, roles: List[str], email: str = None, user_id: str = None) -> Dict[str, Any]:
+        return await self.client.call('post', f'/teams/{team_id}/memberships', {
+            'email': email,
+            'userId': user_id,
+            'roles': roles
+        })
+
+
+class AsyncAccount(AsyncService):
+    """Async counterpart of appwrite.services.account.Account"""
+
+    async def get(self) -> Dict[str, Any]:
+        return await self.client.call('get', '/account')
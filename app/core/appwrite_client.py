@@ -1,26 +1,125 @@
-from appwrite.client import Client
-from appwrite.services.account import Account
-from appwrite.services.databases import Databases
 from appwrite.id import ID
 from appwrite.query import Query
 from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+import httpx
+from .appwrite_async import AsyncClient, AsyncDatabases, AsyncAccount
+from .cache import TTLCache
 from .config import settings
 from models.task import Task, Subtask
 import uuid
 
-def create_client(authenticated=True) -> Client:
-    """Creates an Appwrite client instance with authentication."""
-    client = Client()
+# Process-wide registry: one keep-alive connection pool shared by every client
+_http_client: Optional[httpx.AsyncClient] = None
+_clients: Dict[bool, AsyncClient] = {}
+_user_clients = TTLCache(maxsize=1024, ttl=settings.USER_CLIENT_TTL)
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared HTTP connection pool, creating it on first use"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.APPWRITE_POOL_SIZE,
+                max_keepalive_connections=settings.APPWRITE_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.APPWRITE_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(settings.APPWRITE_TIMEOUT, connect=settings.APPWRITE_CONNECT_TIMEOUT)
+        )
+    return _http_client
+
+async def close_http_client():
+    """Close the shared connection pool on shutdown"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    _clients.clear()
+    _user_clients.clear()
+
+def _new_client() -> AsyncClient:
+    client = AsyncClient(get_http_client())
     client.set_endpoint(settings.APPWRITE_ENDPOINT)
     client.set_project(settings.APPWRITE_PROJECT_ID)
-    if authenticated and settings.APPWRITE_API_KEY:
-        client.set_key(settings.APPWRITE_API_KEY)
     return client
 
-def get_database():
+def create_client(authenticated=True) -> AsyncClient:
+    """Returns the shared async Appwrite client, authenticated with the API key if requested."""
+    if authenticated not in _clients:
+        client = _new_client()
+        if authenticated and settings.APPWRITE_API_KEY:
+            client.set_key(settings.APPWRITE_API_KEY)
+        _clients[authenticated] = client
+    return _clients[authenticated]
+
+def get_user_client(jwt: str) -> AsyncClient:
+    """Returns a client acting as the user behind a JWT, cached until the JWT expires"""
+    client = _user_clients.get(jwt)
+    if client is None:
+        client = _new_client().set_jwt(jwt)
+        _user_clients.set(jwt, client)
+    return client
+
+def get_database() -> AsyncDatabases:
     client = create_client()
-    return Databases(client)
+    return AsyncDatabases(client)
 
-def get_account():
+def get_account() -> AsyncAccount:
     client = create_client()
-    return Account(client)
\ No newline at end of file
+    return AsyncAccount(client)
+
+# Appwrite accepts at most 100 values in a single array query
+QUERY_VALUES_LIMIT = 100
+
+async def iter_documents(database: AsyncDatabases, database_id: str, collection_id: str,
+                         queries: Optional[List[str]] = None,
+                         page_size: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Lazily yield every document matching the queries, one cursor page at a time"""
+    page_size = page_size or settings.APPWRITE_PAGE_SIZE
+    cursor = None
+    while True:
+        page_queries = [*(queries or []), Query.limit(page_size)]
+        if cursor:
+            page_queries.append(Query.cursor_after(cursor))
+        result = await database.list_documents(
+            database_id=database_id,
+            collection_id=collection_id,
+            queries=page_queries
+        )
+        documents = result.get('documents', [])
+        for document in documents:
+            yield document
+        if len(documents) < page_size:
+            return
+        cursor = documents[-1]['$id']
+
+async def iter_documents_in(database: AsyncDatabases, database_id: str, collection_id: str,
+                            attribute: str, values: List[str],
+                            queries: Optional[List[str]] = None,
+                            page_size: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Lazily yield documents whose attribute matches any of the values, chunking large value lists"""
+    for start in range(0, len(values), QUERY_VALUES_LIMIT):
+        chunk = values[start:start + QUERY_VALUES_LIMIT]
+        async for document in iter_documents(
+            database, database_id, collection_id,
+            queries=[Query.equal(attribute, chunk), *(queries or [])],
+            page_size=page_size
+        ):
+            yield document
+
+async def collection_version(database: AsyncDatabases, database_id: str, collection_id: str,
+                             queries: Optional[List[str]] = None) -> str:
+    """Cheap version stamp for the documents matching the queries: their count and latest $updatedAt.
+
+    Any create, update or delete in the slice changes one of the two, so
+    equal stamps mean the slice is unchanged. Costs one single-document
+    request regardless of the slice size.
+    """
+    result = await database.list_documents(
+        database_id=database_id,
+        collection_id=collection_id,
+        queries=[*(queries or []), Query.order_desc('$updatedAt'), Query.limit(1)]
+    )
+    documents = result.get('documents', [])
+    latest = documents[0].get('$updatedAt', '') if documents else ''
+    return f"{result.get('total', len(documents))}@{latest}"
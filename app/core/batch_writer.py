@@ -0,0 +1,96 @@
+"""
+Background writer that takes fire-and-forget records off the request path
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Deque, Optional, Tuple
+from collections import deque
+from core.concurrency import map_limited
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWriter:
+    """Buffers records in memory and writes them in batches from a background task.
+
+    A batch is flushed as soon as `batch_size` records are waiting, or
+    `flush_interval` seconds after a partial batch started waiting, with at
+    most `concurrency` writes in flight. Failed records go to the back of the
+    buffer and are retried on later flushes up to `max_retries` times, then
+    logged and dropped.
+    """
+
+    def __init__(self, write: Callable[[Any], Awaitable[Any]], name: str = "records",
+                 batch_size: int = 50, flush_interval: float = 1.0,
+                 concurrency: int = 8, max_retries: int = 3):
+        self._write = write
+        self.name = name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self._buffer: Deque[Tuple[Any, int]] = deque()
+        self._pending = asyncio.Event()  # something is buffered
+        self._full = asyncio.Event()     # a whole batch is buffered
+        self._stopping = False
+        self._worker: Optional[asyncio.Task] = None
+        self.written = 0
+        self.retried = 0
+        self.failed = 0
+
+    def add(self, *records: Any) -> None:
+        """Queue records for writing; never waits on Appwrite"""
+        self._buffer.extend((record, 0) for record in records)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        self._pending.set()
+        if len(self._buffer) >= self.batch_size:
+            self._full.set()
+
+    async def _run(self) -> None:
+        while self._buffer or not self._stopping:
+            if not self._buffer:
+                self._pending.clear()
+                await self._pending.wait()
+                continue
+            if len(self._buffer) < self.batch_size and not self._stopping:
+                # Give a partial batch a chance to fill
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            await self.flush_once()
+
+    async def flush_once(self) -> None:
+        """Write up to one batch"""
+        batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+        if not batch:
+            return
+        results = await map_limited(lambda entry: self._write(entry[0]), batch,
+                                    limit=self.concurrency, return_exceptions=True)
+        for (record, attempts), result in zip(batch, results):
+            if not isinstance(result, Exception):
+                self.written += 1
+            elif attempts < self.max_retries:
+                self.retried += 1
+                self._buffer.append((record, attempts + 1))
+            else:
+                self.failed += 1
+                logger.error(f"Dropping {self.name} record after {attempts + 1} attempts: {result}",
+                             exc_info=result)
+
+    async def drain(self) -> None:
+        """Write everything still buffered and stop the background task; registered as a shutdown handler"""
+        if self._worker is not None and not self._worker.done():
+            self._stopping = True
+            self._pending.set()
+            self._full.set()
+            await self._worker
+        while self._buffer:
+            await self.flush_once()
+        self._stopping = False
+
+    def stats(self) -> dict:
+        return {"buffered": len(self._buffer), "written": self.written,
+                "retried": self.retried, "failed": self.failed}
@@ -0,0 +1,135 @@
+"""
+Pub/sub backends that carry SSE events between app processes
+"""
+import asyncio
+import json
+import logging
+from abc import ABC, abstractmethod
+import os
+import sqlite3
+import time
+import uuid
+from typing import Awaitable, Callable, List, Optional
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Called with (events, topics) for every published batch, local or remote
+Deliver = Callable[[list, List[str]], Awaitable[None]]
+
+
+class Broker(ABC):
+    """Interface between SSEManager and whatever connects the workers"""
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+
+    @abstractmethod
+    async def publish(self, events: list, topics: List[str]) -> None:
+        """Deliver a batch of events to subscribers of the topics on every worker"""
+
+    async def stop(self) -> None:
+        pass
+
+
+class LocalBroker(Broker):
+    """Single-process broker: events only reach clients of this worker"""
+
+    async def publish(self, events: list, topics: List[str]) -> None:
+        await self._deliver(events, topics)
+
+
+class SQLiteBroker(Broker):
+    """Relays events through a shared SQLite file polled by every worker on the host.
+
+    Each publish is delivered locally straight away and appended to an events
+    table; the other workers pick it up on their next poll. Rows older than
+    `retention` seconds are pruned.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.1, retention: float = 60.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.origin = uuid.uuid4().hex
+        self._last_id = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._poller: Optional[asyncio.Task] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS sse_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                origin TEXT NOT NULL,
+                topics TEXT NOT NULL,
+                events TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        return conn
+
+    async def start(self, deliver: Deliver) -> None:
+        await super().start(deliver)
+        self._conn = await asyncio.to_thread(self._connect)
+        # Only relay what is published from now on
+        row = await asyncio.to_thread(lambda: self._conn.execute("SELECT MAX(id) FROM sse_events").fetchone())
+        self._last_id = row[0] or 0
+        self._poller = asyncio.create_task(self._poll())
+
+    async def publish(self, events: list, topics: List[str]) -> None:
+        await self._deliver(events, topics)
+        try:
+            await asyncio.to_thread(
+                self._conn.execute,
+                "INSERT INTO sse_events (origin, topics, events, created_at) VALUES (?, ?, ?, ?)",
+                (self.origin, json.dumps(list(topics)), json.dumps(events), time.time())
+            )
+        except sqlite3.Error:
+            # The write that produced the events already succeeded; other workers'
+            # clients catch up through Last-Event-ID replay or their next resync
+            logger.exception("SSE broker could not relay events to other workers")
+
+    def _fetch(self) -> list:
+        rows = self._conn.execute(
+            "SELECT id, origin, topics, events FROM sse_events WHERE id > ? ORDER BY id",
+            (self._last_id,)
+        ).fetchall()
+        self._conn.execute("DELETE FROM sse_events WHERE created_at < ?", (time.time() - self.retention,))
+        return rows
+
+    async def _poll(self) -> None:
+        while True:
+            try:
+                for row_id, origin, topics, events in await asyncio.to_thread(self._fetch):
+                    self._last_id = row_id
+                    if origin != self.origin:
+                        await self._deliver(json.loads(events), json.loads(topics))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Keep polling: a dead poller would cut this worker off from the others
+                logger.exception("SSE broker poll failed")
+            await asyncio.sleep(self.poll_interval)
+
+    async def stop(self) -> None:
+        if self._poller:
+            self._poller.cancel()
+            try:
+                await self._poller
+            except asyncio.CancelledError:
+                pass
+        if self._conn:
+            self._conn.close()
+
+
+def create_broker(kind: Optional[str] = None) -> Broker:
+    """Broker selected by SSE_BROKER: 'local' (default) or 'sqlite'"""
+    kind = kind or settings.SSE_BROKER
+    if kind == "local":
+        return LocalBroker()
+    if kind == "sqlite":
+        return SQLiteBroker(settings.SSE_BROKER_PATH, poll_interval=settings.SSE_BROKER_POLL_INTERVAL)
+    raise ValueError(f"Unknown SSE broker '{kind}'")
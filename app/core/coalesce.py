@@ -0,0 +1,84 @@
+"""
+Keyed coalescing: collapse bursts of updates to the same key into one write
+"""
+import asyncio
+import logging
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Every live Coalescer, so pending work can be flushed on shutdown
+_coalescers: "weakref.WeakSet[Coalescer]" = weakref.WeakSet()
+
+
+class Coalescer:
+    """Keeps only the latest value per key and hands it to `flush` `window` seconds after the first pending update"""
+
+    def __init__(self, flush: Callable[[Hashable, Any], Awaitable[Any]], window: float):
+        self._flush = flush
+        self.window = window
+        self._pending: Dict[Hashable, Any] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        self._tasks: set = set()
+        # key -> (lock, number of flushes holding or waiting for it)
+        self._locks: Dict[Hashable, Tuple[asyncio.Lock, int]] = {}
+        self.submitted = 0
+        self.flushed = 0
+        _coalescers.add(self)
+
+    def submit(self, key: Hashable, value: Any) -> None:
+        """Replace any pending value for the key, opening a window if none is open.
+
+        The window is not extended by later updates, so continuous typing is
+        still written every `window` seconds.
+        """
+        self.submitted += 1
+        self._pending[key] = value
+        if key not in self._timers:
+            loop = asyncio.get_running_loop()
+            self._timers[key] = loop.call_later(self.window, self._start_flush, key)
+
+    def _start_flush(self, key: Hashable) -> None:
+        self._timers.pop(key, None)
+        task = asyncio.ensure_future(self._run(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: Hashable) -> None:
+        # One flush per key at a time, so a slow write can never land after a newer one
+        lock, users = self._locks.get(key, (asyncio.Lock(), 0))
+        self._locks[key] = (lock, users + 1)
+        try:
+            async with lock:
+                # Taken only now, so the write carries the newest value
+                if key not in self._pending:
+                    return
+                value = self._pending.pop(key)
+                self.flushed += 1
+                try:
+                    await self._flush(key, value)
+                except Exception:
+                    logger.exception(f"Error flushing coalesced update for {key}")
+        finally:
+            lock, users = self._locks[key]
+            if users == 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, users - 1)
+
+    async def flush(self) -> None:
+        """Write every pending value now and wait for in-flight writes"""
+        for timer in self._timers.values():
+            timer.cancel()
+        keys = list(self._timers)
+        self._timers.clear()
+        await asyncio.gather(*(self._run(key) for key in keys), *self._tasks)
+
+    def stats(self) -> dict:
+        return {"submitted": self.submitted, "flushed": self.flushed, "pending": len(self._pending)}
+
+
+async def flush_pending() -> None:
+    """Flush every coalescer; registered as a shutdown handler"""
+    await asyncio.gather(*(coalescer.flush() for coalescer in list(_coalescers)))
@@ -0,0 +1,86 @@
+"""
+Response compression: brotli where the client accepts it, gzip otherwise
+"""
+import gzip
+from typing import List, Optional
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+try:
+    # Pinned in requirements.txt; the fallback keeps partial environments working with gzip only
+    import brotli
+except ImportError:
+    brotli = None
+
+# Preferred first; brotli is only offered when it can actually be produced
+ENCODINGS = ("br", "gzip") if brotli else ("gzip",)
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+
+def accepted_encodings(accept_encoding: str) -> List[str]:
+    """Encodings from an Accept-Encoding header that we support, in our order of preference"""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        name, _, value = params.partition("=")
+        try:
+            if name.strip().lower() == "q" and float(value) == 0:
+                continue  # explicitly refused
+        except ValueError:
+            pass
+        accepted.add(coding.strip().lower())
+    if "*" in accepted:
+        return list(ENCODINGS)
+    return [encoding for encoding in ENCODINGS if encoding in accepted]
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """One-shot compression at the highest level, for content compressed once and reused"""
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int = 5) -> None:
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        # Flush after every chunk so streamed responses reach the client as they are produced
+        data = self.compressor.process(body)
+        return data + (self.compressor.flush() if more_body else self.compressor.finish())
+
+
+class CompressionMiddleware:
+    """Compresses dynamic responses with the best encoding the client accepts.
+
+    Built on Starlette's gzip responders, so bodies under `minimum_size`
+    (most HTMX fragments), text/event-stream responses and responses that
+    already carry a Content-Encoding (precompressed assets) pass through
+    untouched.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024,
+                 gzip_level: int = 6, brotli_quality: int = 5) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _responder(self, encoding: Optional[str]) -> ASGIApp:
+        if encoding == "br":
+            return BrotliResponder(self.app, self.minimum_size, quality=self.brotli_quality)
+        if encoding == "gzip":
+            return GZipResponder(self.app, self.minimum_size, compresslevel=self.gzip_level)
+        return IdentityResponder(self.app, self.minimum_size)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encodings = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        await self._responder(encodings[0] if encodings else None)(scope, receive, send)
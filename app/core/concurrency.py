@@ -0,0 +1,28 @@
+"""
+Helpers for running independent Appwrite calls concurrently within a request
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, TypeVar
+from .config import settings
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+async def gather_limited(*aws: Awaitable[Any], limit: Optional[int] = None,
+                         return_exceptions: bool = False) -> List[Any]:
+    """Await independent calls concurrently, at most `limit` in flight, preserving order"""
+    semaphore = asyncio.Semaphore(limit or settings.APPWRITE_FANOUT_LIMIT)
+
+    async def run(aw: Awaitable[Any]) -> Any:
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*(run(aw) for aw in aws), return_exceptions=return_exceptions)
+
+
+async def map_limited(func: Callable[[T], Awaitable[R]], items: Iterable[T],
+                      limit: Optional[int] = None, return_exceptions: bool = False) -> List[R]:
+    """Apply an async function to every item with bounded concurrency, preserving order"""
+    return await gather_limited(*(func(item) for item in items), limit=limit,
+                                return_exceptions=return_exceptions)
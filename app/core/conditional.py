@@ -0,0 +1,50 @@
+"""
+ETags and conditional GET for views rendered from Appwrite collections
+"""
+import hashlib
+import logging
+from typing import Any, Awaitable, Optional, Tuple
+from fasthtml.common import HttpHeader
+from starlette.requests import Request
+from starlette.responses import Response
+from core.static import BUILD_ID
+
+logger = logging.getLogger(__name__)
+
+
+async def view_etag(req: Request, version: Awaitable[Any], *parts: Any) -> Optional[str]:
+    """Strong ETag for a view from its data version plus whatever else shapes the markup.
+
+    `parts` are the view's own inputs (storage location, role, ...). The
+    build ID and whether this is an HTMX request (fragment vs full page) are
+    always included. Returns None when the version lookup fails, in which
+    case the view renders as if no ETag support existed.
+    """
+    try:
+        stamp = await version
+    except Exception as e:
+        logger.warning(f"Version lookup for {req.url.path} failed, skipping ETag: {e}")
+        return None
+    key = repr((BUILD_ID, req.headers.get('hx-request') == 'true', parts, stamp))
+    return f'"{hashlib.sha256(key.encode()).hexdigest()[:32]}"'
+
+
+def etag_matches(req: Request, etag: Optional[str]) -> bool:
+    """Whether the client's If-None-Match already names this ETag"""
+    if etag is None:
+        return False
+    header = req.headers.get('if-none-match', '')
+    # GET uses weak comparison, and the compression middleware may hand back W/ tags
+    return header.strip() == '*' or etag in (tag.strip().removeprefix('W/') for tag in header.split(','))
+
+
+def etag_headers(etag: Optional[str]) -> Tuple[HttpHeader, ...]:
+    """Headers that let the browser keep the response and revalidate it on every request"""
+    if etag is None:
+        return ()
+    return (HttpHeader('ETag', etag), HttpHeader('Cache-Control', 'no-cache'), HttpHeader('Vary', 'HX-Request'))
+
+
+def not_modified(etag: str) -> Response:
+    """304 sent before any documents are loaded or markup rendered"""
+    return Response(status_code=304, headers={h.k: h.v for h in etag_headers(etag)})
@@ -20,9 +20,78 @@ class Settings:
     TASKS_DATABASE_ID = os.getenv("APPWRITE_DATABASE_ID")
     INVENTORY_DATABASE_ID = os.getenv("APPWRITE_DATABASE_ID")
     DATABASE_ID = os.getenv("APPWRITE_DATABASE_ID")
+    APPWRITE_PAGE_SIZE = int(os.getenv("APPWRITE_PAGE_SIZE", 100))
+    INVENTORY_CACHE_SIZE = int(os.getenv("INVENTORY_CACHE_SIZE", 1024))
+    INVENTORY_CACHE_TTL = float(os.getenv("INVENTORY_CACHE_TTL", 60))
+    # Unit conversion factors are refetched per item once older than this
+    UNIT_INDEX_TTL = float(os.getenv("UNIT_INDEX_TTL", 300))
+    # Concurrent Appwrite writes while applying a bulk stock count
+    INVENTORY_BULK_CONCURRENCY = int(os.getenv("INVENTORY_BULK_CONCURRENCY", 16))
+
+    # Appwrite HTTP connection pool
+    APPWRITE_POOL_SIZE = int(os.getenv("APPWRITE_POOL_SIZE", 20))
+    APPWRITE_KEEPALIVE_CONNECTIONS = int(os.getenv("APPWRITE_KEEPALIVE_CONNECTIONS", 10))
+    APPWRITE_KEEPALIVE_EXPIRY = float(os.getenv("APPWRITE_KEEPALIVE_EXPIRY", 30))
+    APPWRITE_TIMEOUT = float(os.getenv("APPWRITE_TIMEOUT", 10))
+    APPWRITE_CONNECT_TIMEOUT = float(os.getenv("APPWRITE_CONNECT_TIMEOUT", 5))
+    # Max concurrent Appwrite calls fanned out by a single request
+    APPWRITE_FANOUT_LIMIT = int(os.getenv("APPWRITE_FANOUT_LIMIT", 8))
+    # Appwrite JWTs are valid for 15 minutes
+    USER_CLIENT_TTL = float(os.getenv("USER_CLIENT_TTL", 15 * 60))
     
+    # Server-sent events: per-client queue bound and what to do when a client falls behind
+    # (drop_oldest, coalesce, or disconnect to make the client reconnect and resync)
+    SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", 100))
+    SSE_OVERFLOW_POLICY = os.getenv("SSE_OVERFLOW_POLICY", "coalesce")
+    # Heartbeat comment interval, how long a stream may go without events before it is
+    # closed (the client reconnects and replays), and concurrent streams per user
+    SSE_HEARTBEAT_INTERVAL = int(os.getenv("SSE_HEARTBEAT_INTERVAL", 15))
+    SSE_IDLE_TIMEOUT = float(os.getenv("SSE_IDLE_TIMEOUT", 30 * 60))
+    SSE_MAX_STREAMS_PER_USER = int(os.getenv("SSE_MAX_STREAMS_PER_USER", 5))
+    # Recent SSE events kept for replay to clients reconnecting with Last-Event-ID
+    SSE_REPLAY_BUFFER = int(os.getenv("SSE_REPLAY_BUFFER", 500))
+    # How SSE events reach clients connected to other workers: "local" for a
+    # single worker, "sqlite" to relay through a file shared by all workers on the host
+    SSE_BROKER = os.getenv("SSE_BROKER", "local")
+    SSE_BROKER_PATH = os.getenv("SSE_BROKER_PATH", "/tmp/chainflow/sse_events.db")
+    SSE_BROKER_POLL_INTERVAL = float(os.getenv("SSE_BROKER_POLL_INTERVAL", 0.1))
+    # Rendered task fragments shared by SSE events and HTMX responses
+    FRAGMENT_CACHE_SIZE = int(os.getenv("FRAGMENT_CACHE_SIZE", 2048))
+    FRAGMENT_CACHE_TTL = float(os.getenv("FRAGMENT_CACHE_TTL", 600))
+    # Task history is written in the background in batches of this size, at least this often (seconds)
+    HISTORY_BATCH_SIZE = int(os.getenv("HISTORY_BATCH_SIZE", 50))
+    HISTORY_FLUSH_INTERVAL = float(os.getenv("HISTORY_FLUSH_INTERVAL", 1))
+    HISTORY_MAX_RETRIES = int(os.getenv("HISTORY_MAX_RETRIES", 3))
+    # Background jobs (nightly archive/reset): concurrent writes and retries per write
+    JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", 16))
+    JOB_MAX_RETRIES = int(os.getenv("JOB_MAX_RETRIES", 3))
+    # Finished jobs kept for status and resume: at most this many, for this many seconds
+    JOB_HISTORY_SIZE = int(os.getenv("JOB_HISTORY_SIZE", 100))
+    JOB_HISTORY_TTL = float(os.getenv("JOB_HISTORY_TTL", 7 * 24 * 3600))
+    # Note edits for a task are collected for this long (seconds), then written and broadcast once
+    NOTE_COALESCE_WINDOW = float(os.getenv("NOTE_COALESCE_WINDOW", 2))
+
+    # Identifies the deployed code in ETags; derived from the source files when unset
+    BUILD_ID = os.getenv("BUILD_ID", "")
+    # Memoized layout fragments (seconds); they can embed lookup data, so they expire
+    MEMO_CACHE_SIZE = int(os.getenv("MEMO_CACHE_SIZE", "512"))
+    MEMO_CACHE_TTL = float(os.getenv("MEMO_CACHE_TTL", 3600))
+
+    # Serve app/assets as one minified CSS and one JS bundle instead of file by file
+    ASSET_BUNDLE = os.getenv("ASSET_BUNDLE", "0") == "1"
+
+    # Responses smaller than this (most HTMX fragments) are sent uncompressed
+    COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+    COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+
     # Auth settings
     OAUTH_SCOPES = ["openid", "email"]
+    AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", 512))
+    AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", 300))
+    # Store resolved role/branch in the signed session at login
+    SESSION_AUTH_CLAIMS = os.getenv("SESSION_AUTH_CLAIMS", "1") == "1"
+    # Seconds the stored claims are trusted before role changes are looked up again
+    SESSION_CLAIMS_TTL = float(os.getenv("SESSION_CLAIMS_TTL", 60))
 
     # GitHub settings
     GITHUB_WEBHOOK_SECRET = os.getenv("GITHUB_WEBHOOK_SECRET", None)
@@ -0,0 +1,88 @@
+"""
+Render-once caches for HTML fragments: task fragments pushed over SSE and
+returned to HTMX, and memoized state-free layout functions
+"""
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from fasthtml.common import to_xml, NotStr
+from core.cache import TTLCache
+from core.config import settings
+from models.task import Task, Subtask
+from layout.tasks import task_checkbox, subtask_checkbox, task_note_form
+
+class Fragment(NotStr):
+    """Pre-rendered HTML that FastHTML still treats as an FT response.
+
+    A plain NotStr returned from a route goes out as-is; with __ft__ it gets
+    the same full-page wrapping and headers as the FT tree it replaces when
+    the request does not come from HTMX.
+    """
+
+    def __ft__(self):
+        return self
+
+
+# Fragment kind -> (renderer, version of the entity as far as that fragment is concerned).
+# The version is the rendered state itself: last_updated is not bumped by every
+# change (subtask toggles, parent status flips), so it cannot key the cache alone.
+FRAGMENTS: Dict[str, Tuple[Callable[[Any], Any], Callable[[Any], Hashable]]] = {
+    "task_checkbox": (task_checkbox, lambda task: (task.title, task.status)),
+    "subtask_checkbox": (subtask_checkbox, lambda subtask: (subtask.title, subtask.status, subtask.task_id)),
+    "task_note_form": (task_note_form, lambda task: task.notes),
+}
+
+_fragment_cache = TTLCache(maxsize=settings.FRAGMENT_CACHE_SIZE, ttl=settings.FRAGMENT_CACHE_TTL)
+
+
+def render_fragment(kind: str, entity: Any) -> Fragment:
+    """Serialized HTML for a fragment, rendered at most once per (kind, entity ID, version)"""
+    renderer, version = FRAGMENTS[kind]
+    key = (kind, entity.id, version(entity))
+    html = _fragment_cache.get(key)
+    if html is None:
+        html = Fragment(to_xml(renderer(entity)))
+        _fragment_cache.set(key, html)
+    return html
+
+
+_memo_cache = TTLCache(maxsize=settings.MEMO_CACHE_SIZE, ttl=settings.MEMO_CACHE_TTL)
+
+
+def memoize_fragment(func: Optional[Callable] = None, *, key: Optional[Callable[..., Hashable]] = None):
+    """Cache the serialized HTML of a pure layout function per arguments.
+
+    Use bare (`@memoize_fragment`) when the arguments alone determine the
+    output, or pass `key` to derive the cache key from the arguments plus any
+    other input the function reads, such as the clock. The wrapped function
+    returns a Fragment, which embeds in FT trees and can be returned from routes.
+    """
+    def decorator(func: Callable) -> Callable:
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            args_key = key(*args, **kwargs) if key else (args, tuple(sorted(kwargs.items())))
+            cache_key = (name, args_key)
+            try:
+                html = _memo_cache.get(cache_key)
+            except TypeError:  # unhashable arguments: render without caching
+                return func(*args, **kwargs)
+            if html is None:
+                html = Fragment(to_xml(func(*args, **kwargs)))
+                _memo_cache.set(cache_key, html)
+            return html
+
+        wrapper.uncached = func
+        return wrapper
+
+    return decorator(func) if func is not None else decorator
+
+
+def clear_fragments() -> None:
+    """Drop every cached fragment, e.g. after changing data a memoized layout reads"""
+    _fragment_cache.clear()
+    _memo_cache.clear()
+
+
+def fragment_stats() -> dict:
+    return {**_fragment_cache.stats(), "memoized": _memo_cache.stats()}
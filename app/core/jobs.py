@@ -0,0 +1,154 @@
+"""
+In-process background jobs made of many independent, retryable operations.
+
+Job state lives in the memory of the worker that ran the job: with
+WEB_CONCURRENCY > 1 a job's status and resume endpoints only work on that
+worker, so status polling needs sticky routing or a single worker.
+"""
+import asyncio
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from core.cache import TTLCache
+from core.concurrency import map_limited
+from core.config import settings
+
+
+@dataclass
+class Operation:
+    """One idempotent unit of work in a job, e.g. a single document write"""
+    key: str
+    run: Callable[[], Awaitable[Any]]
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    status: str = "pending"  # pending, queued, running, completed, failed
+    total: int = 0
+    done: int = 0
+    created_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    finished_at: Optional[str] = None
+    error: Optional[str] = None
+    # Name shared by jobs that must not run at the same time
+    exclusive: Optional[str] = None
+    # Operations that still failed after every retry; resume() runs only these
+    failed: List[Operation] = field(default_factory=list, repr=False)
+    errors: Dict[str, str] = field(default_factory=dict, repr=False)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "total": self.total,
+            "done": self.done,
+            "failed": len(self.failed),
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            # A sample is enough to diagnose; the full list can be thousands long
+            "errors": dict(list(self.errors.items())[:20]),
+        }
+
+
+class JobRunner:
+    """Runs jobs in the background through a bounded worker pool with per-operation retry"""
+
+    def __init__(self, concurrency: int = 16, max_retries: int = 3, retry_delay: float = 0.5,
+                 history_size: int = 100, history_ttl: float = 7 * 24 * 3600):
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        # Queued and running jobs; finished ones move to a bounded, expiring history
+        self._jobs: Dict[str, Job] = {}
+        self._finished = TTLCache(maxsize=history_size, ttl=history_ttl)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # Jobs submitted with the same `exclusive` name run one at a time, in submission order
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id) or self._finished.get(job_id)
+
+    def submit(self, kind: str, plan: Callable[[], Awaitable[List[Operation]]],
+               exclusive: Optional[str] = None) -> Job:
+        """Start a job in the background; `plan` loads whatever it needs and returns the operations.
+
+        Jobs sharing an `exclusive` name never overlap: a later one stays
+        queued until the earlier ones have finished.
+        """
+        job = Job(id=uuid.uuid4().hex, kind=kind, exclusive=exclusive)
+        self._jobs[job.id] = job
+        self._start(job, self._plan_and_run(job, plan))
+        return job
+
+    def resume(self, job_id: str) -> Optional[Job]:
+        """Re-run only the operations a finished job could not complete"""
+        job = self.get(job_id)
+        if job is None or job.status in ("queued", "running") or not job.failed:
+            return job
+        operations, job.failed, job.errors = job.failed, [], {}
+        self._finished.pop(job.id)
+        self._jobs[job.id] = job
+        self._start(job, self._run(job, operations))
+        return job
+
+    async def wait(self, job_id: str) -> Optional[Job]:
+        task = self._tasks.get(job_id)
+        if task is not None:
+            await asyncio.shield(task)
+        return self.get(job_id)
+
+    def _start(self, job: Job, coro: Awaitable[None]) -> None:
+        lock = self._locks.setdefault(job.exclusive, asyncio.Lock()) if job.exclusive else None
+        job.status = "running" if lock is None else "queued"
+        job.finished_at = None
+        task = asyncio.create_task(self._exclusively(job, lock, coro))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._finish(job))
+
+    def _finish(self, job: Job) -> None:
+        self._tasks.pop(job.id, None)
+        self._jobs.pop(job.id, None)
+        self._finished.set(job.id, job)
+
+    async def _exclusively(self, job: Job, lock: Optional[asyncio.Lock], coro: Awaitable[None]) -> None:
+        if lock is None:
+            return await coro
+        # asyncio.Lock wakes waiters first in, first out, which keeps submission order
+        async with lock:
+            job.status = "running"
+            await coro
+
+    async def _plan_and_run(self, job: Job, plan: Callable[[], Awaitable[List[Operation]]]) -> None:
+        try:
+            operations = await plan()
+        except Exception as e:
+            job.status, job.error, job.finished_at = "failed", f"Planning failed: {e}", datetime.now().isoformat()
+            return
+        job.total = len(operations)
+        await self._run(job, operations)
+
+    async def _run(self, job: Job, operations: List[Operation]) -> None:
+        async def attempt(operation: Operation) -> None:
+            for retry in range(self.max_retries + 1):
+                try:
+                    await operation.run()
+                    job.done += 1
+                    return
+                except Exception as e:
+                    if retry == self.max_retries:
+                        job.failed.append(operation)
+                        job.errors[operation.key] = str(e)
+                        return
+                    await asyncio.sleep(self.retry_delay * 2 ** retry)
+
+        await map_limited(attempt, operations, limit=self.concurrency)
+        job.status = "failed" if job.failed else "completed"
+        job.finished_at = datetime.now().isoformat()
+
+
+job_runner = JobRunner(concurrency=settings.JOB_CONCURRENCY, max_retries=settings.JOB_MAX_RETRIES,
+                       history_size=settings.JOB_HISTORY_SIZE, history_ttl=settings.JOB_HISTORY_TTL)
@@ -3,94 +3,329 @@ SSE Manager for handling real-time task updates across multiple users
 """
 import asyncio
 import json
-from typing import Dict, Set, Any
-from datetime import datetime
-from fasthtml.common import to_xml
+import time
+import uuid
+from collections import Counter, deque
+from typing import Deque, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple, Any
+from core.config import settings
+from core.broker import Broker, LocalBroker, create_broker
+from core.fragments import render_fragment, fragment_stats
 from models.task import Task, Subtask
-from layout.tasks import task_checkbox, subtask_checkbox, task_note_form
+
+# Topic every viewer of the /tasks page subscribes to
+TASKS_TOPIC = "tasks"
+
+def task_topic(task_id: str) -> str:
+    """Topic carrying updates for a single task"""
+    return f"task:{task_id}"
+
+OVERFLOW_POLICIES = ("drop_oldest", "coalesce", "disconnect")
+
+# Sent to a client dropped under the disconnect policy; TasksPage reloads on it
+RESYNC_EVENT = {"event": "Resync", "data": ""}
+
+# Queued after RESYNC_EVENT to tell the stream generator to close
+CLOSE = object()
+
+class TooManyStreams(Exception):
+    """A user tried to open more concurrent streams than allowed"""
+
+class EventQueue(asyncio.Queue):
+    """Bounded per-client event queue that never blocks the publisher"""
+
+    def __init__(self, maxsize: int = 100, policy: str = "coalesce", user_id: Optional[str] = None):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown SSE overflow policy '{policy}'")
+        # The underlying queue is unbounded so the terminal items queued by close()
+        # always fit; offer() enforces the limit for regular events
+        super().__init__()
+        self.limit = maxsize
+        self.policy = policy
+        self.user_id = user_id
+        self.closed = False
+        self.dropped = 0
+        self.coalesced = 0
+        self.opened_at = time.monotonic()
+
+    def offer(self, event: dict) -> bool:
+        """Enqueue without waiting, applying the overflow policy when full.
+
+        Returns False when the client has to be disconnected.
+        """
+        if self.closed:
+            return False
+        if self.qsize() < self.limit:
+            self.put_nowait(event)
+            return True
+
+        if self.policy == "disconnect":
+            self.close(resync=True)
+            return False
+
+        if self.policy == "coalesce":
+            # Every event name targets one sse-swap element, so only the newest matters
+            pending = self._drain()
+            for i, queued in enumerate(pending):
+                if queued.get("event") == event.get("event"):
+                    del pending[i]
+                    self.coalesced += 1
+                    break
+            else:
+                # Nothing to merge into: fall back to dropping the oldest
+                del pending[0]
+                self.dropped += 1
+            for queued in pending + [event]:
+                self.put_nowait(queued)
+            return True
+
+        self._drain(1)
+        self.dropped += 1
+        self.put_nowait(event)
+        return True
+
+    def close(self, resync: bool = False):
+        """Discard pending events and make the stream end, optionally telling the client to resync"""
+        self.dropped += len(self._drain())
+        self.closed = True
+        if resync:
+            self.put_nowait(RESYNC_EVENT)
+        self.put_nowait(CLOSE)
+
+    def _drain(self, limit: Optional[int] = None) -> List[Any]:
+        """Take up to `limit` queued items (all by default), oldest first"""
+        items = []
+        while not self.empty() and (limit is None or len(items) < limit):
+            items.append(self.get_nowait())
+            self.task_done()
+        return items
+
+def task_status_event(task: Task) -> dict:
+    return {"data": render_fragment("task_checkbox", task), "event": f"TaskStatusUpdate_{task.id}"}
+
+def subtask_status_event(subtask: Subtask) -> dict:
+    return {"data": render_fragment("subtask_checkbox", subtask), "event": f"SubtaskStatusUpdate_{subtask.id}"}
+
+def task_note_event(task: Task) -> dict:
+    return {"data": render_fragment("task_note_form", task), "event": f"TaskNoteUpdate_{task.id}"}
 
 class SSEManager:
-    """Manages SSE connections and broadcasts updates to all connected clients"""
-    
-    def __init__(self):
-        self._connections: Set[asyncio.Queue] = set()
-        self._task_subscribers: Dict[str, Set[asyncio.Queue]] = {}
-    
-    def add_connection(self, queue: asyncio.Queue):
-        """Add a new SSE connection"""
-        self._connections.add(queue)
-    
+    """Manages SSE connections and routes updates to the clients subscribed to them"""
+
+    def __init__(self, broker: Optional[Broker] = None):
+        # topic -> subscribed queues, and the reverse index queue -> topics
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._topics: Dict[asyncio.Queue, Set[str]] = {}
+        self.metrics = Counter()
+        self.broker = broker or LocalBroker()
+        self._started = False
+        # Event IDs are "<epoch>-<seq>"; the epoch tells replay whether an ID came from this process
+        self.epoch = uuid.uuid4().hex[:8]
+        self._seq = 0
+        self._history: Deque[Tuple[int, FrozenSet[str], dict]] = deque(maxlen=settings.SSE_REPLAY_BUFFER)
+        # user ID -> that user's open streams
+        self._user_streams: Dict[str, Dict[EventQueue, None]] = {}
+        # (delivery time, event count) over the last minute, for throughput
+        self._recent: Deque[Tuple[float, int]] = deque()
+        self._started_at = time.monotonic()
+
+    async def start(self):
+        """Connect to the broker; registered as a startup handler"""
+        if not self._started:
+            await self.broker.start(self._deliver)
+            self._started = True
+
+    async def stop(self):
+        """Disconnect from the broker; registered as a shutdown handler"""
+        if self._started:
+            await self.broker.stop()
+            self._started = False
+
+    @property
+    def connection_count(self) -> int:
+        return len(self._topics)
+
+    def connect(self, topics: Iterable[str] = (TASKS_TOPIC,), user_id: Optional[str] = None,
+                maxsize: Optional[int] = None, policy: Optional[str] = None) -> EventQueue:
+        """Create a bounded queue for a new client and subscribe it to the topics.
+
+        Raises TooManyStreams when the user already has SSE_MAX_STREAMS_PER_USER
+        open; closing an older stream instead would make EventSource
+        auto-reconnects from the user's tabs evict each other forever.
+        """
+        if user_id is not None and len(self._user_streams.get(user_id, ())) >= settings.SSE_MAX_STREAMS_PER_USER:
+            self.metrics["rejected"] += 1
+            raise TooManyStreams(f"User {user_id} already has {settings.SSE_MAX_STREAMS_PER_USER} open streams")
+        queue = EventQueue(maxsize or settings.SSE_QUEUE_SIZE, policy or settings.SSE_OVERFLOW_POLICY, user_id)
+        if user_id is not None:
+            self._user_streams.setdefault(user_id, {})[queue] = None
+        self.add_connection(queue, topics)
+        return queue
+
+    def add_connection(self, queue: asyncio.Queue, topics: Iterable[str] = (TASKS_TOPIC,)):
+        """Add a new SSE connection subscribed to the given topics"""
+        self._topics.setdefault(queue, set())
+        for topic in topics:
+            self.subscribe(queue, topic)
+
     def remove_connection(self, queue: asyncio.Queue):
-        """Remove an SSE connection"""
-        self._connections.discard(queue)
-        # Remove from task-specific subscribers
-        for subscribers in self._task_subscribers.values():
+        """Remove an SSE connection, touching only the topics it subscribed to"""
+        user_id = getattr(queue, "user_id", None)
+        if user_id in self._user_streams:
+            self._user_streams[user_id].pop(queue, None)
+            if not self._user_streams[user_id]:
+                del self._user_streams[user_id]
+        for topic in self._topics.pop(queue, ()):
+            subscribers = self._subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[topic]
+
+    def subscribe(self, queue: asyncio.Queue, topic: str):
+        """Subscribe a connection to a topic"""
+        self._subscribers.setdefault(topic, set()).add(queue)
+        self._topics.setdefault(queue, set()).add(topic)
+
+    def unsubscribe(self, queue: asyncio.Queue, topic: str):
+        """Unsubscribe a connection from a topic"""
+        subscribers = self._subscribers.get(topic)
+        if subscribers is not None:
             subscribers.discard(queue)
-    
+            if not subscribers:
+                del self._subscribers[topic]
+        self._topics.get(queue, set()).discard(topic)
+
     def subscribe_to_task(self, task_id: str, queue: asyncio.Queue):
         """Subscribe a connection to updates for a specific task"""
-        if task_id not in self._task_subscribers:
-            self._task_subscribers[task_id] = set()
-        self._task_subscribers[task_id].add(queue)
-    
+        self.subscribe(queue, task_topic(task_id))
+
     async def broadcast_task_update(self, task: Task, update_type: str, subtask_id: str = None):
-        """Broadcast task updates to all connected clients"""
+        """Broadcast task updates to the clients watching the task list or this task"""
         events = []
-        
+
         if update_type == "task_status":
             # Send updated task checkbox
-            events.append({
-                "data": to_xml(task_checkbox(task)),
-                "event": f"TaskStatusUpdate_{task.id}",
-                "id": f"{task.id}_{datetime.now().timestamp()}"
-            })
-            
+            events.append(task_status_event(task))
+
         elif update_type == "subtask_status" and subtask_id:
             # Send updated subtask checkbox
             subtask = next((st for st in task.subtasks if st.id == subtask_id), None)
             if subtask:
-                events.append({
-                    "data": to_xml(subtask_checkbox(subtask)),
-                    "event": f"SubtaskStatusUpdate_{subtask_id}",
-                    "id": f"{subtask_id}_{datetime.now().timestamp()}"
-                })
-            
+                events.append(subtask_status_event(subtask))
+
             # Also send updated task checkbox if parent status changed
-            events.append({
-                "data": to_xml(task_checkbox(task)),
-                "event": f"TaskStatusUpdate_{task.id}",
-                "id": f"{task.id}_{datetime.now().timestamp()}"
-            })
-            
+            events.append(task_status_event(task))
+
         elif update_type == "task_note":
             # Send updated note form
-            events.append({
-                "data": to_xml(task_note_form(task)),
-                "event": f"TaskNoteUpdate_{task.id}",
-                "id": f"{task.id}_note_{datetime.now().timestamp()}"
-            })
-        
-        # Broadcast to all subscribers
-        await self._broadcast_events(events)
-    
-    async def _broadcast_events(self, events: list):
-        """Send events to all connected clients"""
+            events.append(task_note_event(task))
+
+        await self.publish(events, [TASKS_TOPIC, task_topic(task.id)])
+
+    def snapshot_events(self, tasks: List[Task]) -> List[dict]:
+        """Current state of the tasks as events, for clients too far behind to replay"""
+        events = []
+        for task in tasks:
+            events.append(task_status_event(task))
+            events.extend(subtask_status_event(subtask) for subtask in task.subtasks)
+            events.append(task_note_event(task))
+        # Stamp them with the current position so the next reconnect can replay from here
+        return [dict(event, id=f"{self.epoch}-{self._seq}") for event in events]
+
+    def missed_events(self, queue: asyncio.Queue, last_event_id: str) -> Optional[List[dict]]:
+        """Buffered events after last_event_id for the queue's topics.
+
+        Returns None when they cannot be replayed: the ID comes from another
+        worker or an earlier process, or the gap is larger than the buffer.
+        """
+        epoch, _, seq = last_event_id.rpartition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        seq = int(seq)
+        oldest = self._history[0][0] if self._history else self._seq + 1
+        if seq < oldest - 1:
+            return None
+        topics = self._topics.get(queue, set())
+        return [event for event_seq, event_topics, event in self._history
+                if event_seq > seq and topics & event_topics]
+
+    async def publish(self, events: list, topics: Iterable[str]):
+        """Publish events through the broker so every worker's subscribers get them"""
         if not events:
             return
-            
+        await self.start()
+        await self.broker.publish(events, list(topics))
+
+    async def _deliver(self, events: list, topics: Iterable[str]):
+        """Send events to every local connection subscribed to any of the topics, once each"""
+        # Number events in delivery order and keep them for Last-Event-ID replay
+        topics = frozenset(topics)
+        stamped = []
+        for event in events:
+            self._seq += 1
+            event = dict(event, id=f"{self.epoch}-{self._seq}")
+            self._history.append((self._seq, topics, event))
+            stamped.append(event)
+        events = stamped
+        self.metrics["published"] += len(events)
+        now = time.monotonic()
+        self._recent.append((now, len(events)))
+        while self._recent and self._recent[0][0] < now - 60:
+            self._recent.popleft()
+
+        recipients: Set[asyncio.Queue] = set()
+        for topic in topics:
+            recipients.update(self._subscribers.get(topic, ()))
+        await self._broadcast_events(events, recipients)
+
+    async def _broadcast_events(self, events: list, recipients: Set[asyncio.Queue]):
+        """Hand events to the given connections without waiting on any of them"""
         disconnected = set()
-        
-        for queue in self._connections:
-            try:
-                for event in events:
-                    await queue.put(event)
-            except:
-                # Connection is broken, mark for removal
-                disconnected.add(queue)
-        
-        # Clean up disconnected clients
+
+        for queue in recipients:
+            if isinstance(queue, EventQueue):
+                dropped, coalesced = queue.dropped, queue.coalesced
+                if not all(queue.offer(event) for event in events):
+                    disconnected.add(queue)
+                self.metrics["dropped"] += queue.dropped - dropped
+                self.metrics["coalesced"] += queue.coalesced - coalesced
+            else:
+                try:
+                    for event in events:
+                        queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    disconnected.add(queue)
+            if queue not in disconnected:
+                self.metrics["enqueued"] += len(events)
+
+        # Slow clients under the disconnect policy reconnect and resync
         for queue in disconnected:
+            self.metrics["disconnected"] += 1
             self.remove_connection(queue)
 
+    def stats(self) -> dict:
+        """Connection count, per-queue depth and event throughput"""
+        now = time.monotonic()
+        return {
+            "connections": self.connection_count,
+            "users": len(self._user_streams),
+            "uptime_seconds": round(now - self._started_at),
+            "events_last_minute": sum(count for at, count in self._recent if at >= now - 60),
+            "metrics": dict(self.metrics),
+            "fragments": fragment_stats(),
+            "queues": [
+                {
+                    "user_id": getattr(queue, "user_id", None),
+                    "topics": sorted(topics),
+                    "depth": queue.qsize(),
+                    "maxsize": queue.limit,
+                    "dropped": getattr(queue, "dropped", 0),
+                    "coalesced": getattr(queue, "coalesced", 0),
+                    "age_seconds": round(now - queue.opened_at) if hasattr(queue, "opened_at") else None,
+                }
+                for queue, topics in self._topics.items()
+            ],
+        }
+
 # Global SSE manager instance
-sse_manager = SSEManager()
+sse_manager = SSEManager(create_broker())
@@ -1,37 +1,177 @@
 from pathlib import Path
-from datetime import datetime
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import hashlib
+import mimetypes
+import re
 from fasthtml.common import Link, Script
+from starlette.requests import Request
+from starlette.responses import Response
+from core.config import settings
+from core.compression import ENCODINGS, COMPRESSIBLE_TYPES, accepted_encodings, compress
 import logging
 
 logger = logging.getLogger(__name__)
 
+try:
+    # Optional: proper JS minification when installed, plain concatenation otherwise
+    from rjsmin import jsmin
+except ImportError:
+    jsmin = None
 
-def cache_busting():
-    return datetime.now().strftime('%Y%m%d%H%M%S')
+ASSETS_DIR = Path(__file__).parent.parent / 'assets'
+# Output of `npm run build:css` (see tailwind.config.js), relative to ASSETS_DIR
+BUILT_CSS = 'build/app.css'
+IMMUTABLE = 'public, max-age=31536000, immutable'
 
-def fetch_static_files() -> list:
-    current_dir = Path(__file__).parent
-    assets_dir = current_dir.parent / 'assets'
 
-    logger.debug(f"Looking for static files in: {assets_dir}")
+@dataclass
+class Asset:
+    name: str          # logical path relative to the assets directory, e.g. "inventory.js"
+    url: str           # fingerprinted URL, e.g. "/assets/inventory.3f2a9c1b.js"
+    content: bytes
+    etag: str
+    media_type: str
+    # Precompressed bodies by Content-Encoding, only where they are actually smaller
+    encoded: Dict[str, bytes] = field(default_factory=dict, repr=False)
+
+
+def _fingerprint(name: str, content: bytes) -> str:
+    digest = hashlib.sha256(content).hexdigest()[:10]
+    path = Path(name)
+    return str(path.with_name(f"{path.stem}.{digest}{path.suffix}"))
+
+
+def _minify_css(css: str) -> str:
+    """Drop comments and redundant whitespace; leaves declarations untouched"""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    return css.strip()
+
+
+class AssetManifest:
+    """Content-hashed URLs for everything in app/assets, built once at startup"""
+
+    def __init__(self, assets_dir: Path = ASSETS_DIR, bundle: bool = False):
+        self.assets_dir = assets_dir
+        self.bundle = bundle
+        self._by_name: Dict[str, Asset] = {}
+        self._by_url: Dict[str, Asset] = {}
+        self.build()
+
+    def build(self) -> None:
+        self._by_name.clear()
+        self._by_url.clear()
+        files = sorted(path for path in self.assets_dir.rglob('*') if path.is_file())
+        for path in files:
+            self._add(str(path.relative_to(self.assets_dir)), path.read_bytes())
+
+        if self.bundle:
+            # One stylesheet and one script instead of a request per file
+            css = sorted((path for path in files if path.suffix == '.css'),
+                         key=lambda path: str(path.relative_to(self.assets_dir)) != BUILT_CSS)
+            js = [path for path in files if path.suffix == '.js']
+            if css:
+                self._add('bundle.css', _minify_css('\n'.join(p.read_text() for p in css)).encode())
+            if js:
+                source = '\n;\n'.join(p.read_text() for p in js)
+                self._add('bundle.js', (jsmin(source) if jsmin else source).encode())
+        logger.debug(f"Asset manifest: {len(self._by_name)} assets")
+
+    def _add(self, name: str, content: bytes) -> Asset:
+        asset = Asset(
+            name=name,
+            url=f"/assets/{_fingerprint(name, content)}",
+            content=content,
+            etag=f'"{hashlib.sha256(content).hexdigest()[:16]}"',
+            media_type=mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        )
+        if asset.media_type.startswith(COMPRESSIBLE_TYPES):
+            for encoding in ENCODINGS:
+                data = compress(content, encoding)
+                if len(data) < len(content):
+                    asset.encoded[encoding] = data
+        self._by_name[name] = asset
+        self._by_url[asset.url] = asset
+        return asset
+
+    def has(self, name: str) -> bool:
+        return name in self._by_name
+
+    def url(self, name: str) -> str:
+        """Fingerprinted URL for an asset, falling back to the plain path"""
+        asset = self._by_name.get(name)
+        return asset.url if asset else f"/assets/{name}"
+
+    def lookup(self, path: str) -> tuple[Optional[Asset], bool]:
+        """Asset for a request path and whether the path was the fingerprinted one"""
+        asset = self._by_url.get(path)
+        if asset:
+            return asset, True
+        return self._by_name.get(path.removeprefix('/assets/')), False
 
+    def page_assets(self) -> List[Asset]:
+        """Stylesheets and scripts to include on every page"""
+        if self.bundle:
+            return [self._by_name[name] for name in ('bundle.css', 'bundle.js') if name in self._by_name]
+        assets = [asset for name, asset in self._by_name.items()
+                  if Path(name).suffix in ('.css', '.js') and not name.startswith('bundle.')]
+        # The compiled Tailwind sheet goes first so the app's own CSS can override it
+        return sorted(assets, key=lambda asset: asset.name != BUILT_CSS)
+
+
+asset_manifest = AssetManifest(bundle=settings.ASSET_BUNDLE)
+
+
+def _source_fingerprint() -> str:
+    """Hash of the app's code and assets, so every deploy of changed code gets a new build ID"""
+    digest = hashlib.sha256()
+    root = ASSETS_DIR.parent
+    for path in sorted(root.rglob('*')):
+        if path.is_file() and (path.suffix == '.py' or ASSETS_DIR in path.parents):
+            digest.update(str(path.relative_to(root)).encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+BUILD_ID = settings.BUILD_ID or _source_fingerprint()
+
+
+def _variant_etag(etag: str, encoding: Optional[str]) -> str:
+    """ETag of one encoded representation, e.g. '"3f2a9c1b"' -> '"3f2a9c1b-gzip"'"""
+    return f'{etag[:-1]}-{encoding}"' if encoding else etag
+
+
+async def serve_asset(request: Request) -> Response:
+    """Serve /assets/*: fingerprinted URLs are cached forever, plain ones revalidate"""
+    asset, fingerprinted = asset_manifest.lookup(request.url.path)
+    if asset is None:
+        return Response('Not found', status_code=404)
+    encoding = next((encoding for encoding in accepted_encodings(request.headers.get('accept-encoding', ''))
+                     if encoding in asset.encoded), None)
+    # Each encoding is a different body, so it gets its own ETag and only revalidates against that
+    etag = _variant_etag(asset.etag, encoding)
+    headers = {'ETag': etag, 'Cache-Control': IMMUTABLE if fingerprinted else 'no-cache'}
+    if asset.encoded:
+        headers['Vary'] = 'Accept-Encoding'
+    if_none_match = request.headers.get('if-none-match', '')
+    if if_none_match.strip() == '*' or etag in (tag.strip().removeprefix('W/') for tag in if_none_match.split(',')):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        # Content-Encoding set here also tells CompressionMiddleware to leave it alone
+        headers['Content-Encoding'] = encoding
+        return Response(asset.encoded[encoding], media_type=asset.media_type, headers=headers)
+    return Response(asset.content, media_type=asset.media_type, headers=headers)
+
+
+def fetch_static_files() -> list:
     static_files = []
-    for path in assets_dir.rglob('*'):
-        if path.is_file():
-            # Get path relative to assets directory
-            relative_path = path.relative_to(assets_dir)
-            logger.debug(f"Found static file: {relative_path}")
-
-            if path.suffix == '.css':
-                static_files.append(Link(
-                    rel='stylesheet', 
-                    href=f'/assets/{relative_path}?t={cache_busting()}', 
-                    type='text/css'
-                ))
-            elif path.suffix == '.js':
-                static_files.append(Script(
-                    src=f'/assets/{relative_path}?t={cache_busting()}'
-                ))
+    for asset in asset_manifest.page_assets():
+        if asset.name.endswith('.css'):
+            static_files.append(Link(rel='stylesheet', href=asset.url, type='text/css'))
+        else:
+            static_files.append(Script(src=asset.url))
 
     logger.debug(f"Total static files found: {len(static_files)}")
-    return static_files
\ No newline at end of file
+    return static_files
@@ -1,25 +1,31 @@
 from typing import List, Optional, Dict
-from appwrite.services.users import Users
-from appwrite.services.teams import Teams
+from core.appwrite_async import AsyncUsers, AsyncTeams
 from core.appwrite_client import create_client
+from core.cache import TTLCache
+from core.config import settings
 from models.user import UserRole
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# Shared across AuthDatabase instances so every route sees the same entries
+_user_cache = TTLCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL)
+_branch_cache = TTLCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL)
+
 class AuthDatabase:
     def __init__(self):
         self.client = create_client(authenticated=True)
-        self.users = Users(self.client)
-        self.teams = Teams(self.client)
+        self.users = AsyncUsers(self.client)
+        self.teams = AsyncTeams(self.client)
 
-    def create_user(self, email: str, password: str, name: str, phone : str = None, branch_id: str = None) -> Dict:
+    async def create_user(self, email: str, password: str, name: str, phone : str = None, branch_id: str = None) -> Dict:
         """Create a new user and add them to their branch team"""
         try:
             logger.info(f"Creating user: {email} for branch: {branch_id}")
             
             # Create user
-            user = self.users.create(
+            user = await self.users.create(
                 user_id='unique()',
                 email=email,
                 password=password,
@@ -28,12 +34,13 @@ class AuthDatabase:
             )
             
             # Add to branch team
-            self.teams.create_membership(
+            await self.teams.create_membership(
                 team_id=branch_id,
                 email=email,
                 roles=['member']
             )
             
+            self.invalidate_user(user['$id'])
             logger.info(f"User created successfully: {user['$id']}")
             return user
             
@@ -41,36 +48,62 @@ class AuthDatabase:
             logger.error(f"Failed to create user: {e}")
             raise
 
-    def get_user_teams(self) -> List[Dict]:
+    async def get_user_teams(self) -> List[Dict]:
         """Get all teams a user belongs to"""
         try:
-            memberships = self.teams.list()
-            return memberships['teams'] if memberships and 'teams' in memberships else []
+            return await self._list_teams()
         except Exception as e:
             logger.error(f"Failed to get user teams: {e}")
             return []
 
-    def get_user_branch(self, user_id: str) -> Optional[str]:
+    async def _list_teams(self) -> List[Dict]:
+        memberships = await self.teams.list()
+        return memberships['teams'] if memberships and 'teams' in memberships else []
+
+    async def get_user_branch(self, user_id: str) -> Optional[str]:
         """Get user's branch ID from their team membership"""
         if not user_id:
             logger.warning("User ID is empty, cannot get branch")
             return None
             
-        teams = self.get_user_teams()
-        
+        if user_id in _branch_cache:
+            return _branch_cache.get(user_id)
+
+        try:
+            teams = await self._list_teams()
+        except Exception as e:
+            # Not cached, so the next request retries instead of seeing no branch until the TTL runs out
+            logger.error(f"Failed to get teams for user {user_id}: {e}")
+            return None
+
         # First team ID is the branch ID
-        return teams[0]['name'] if teams else None
+        branch = teams[0]['name'] if teams else None
+        _branch_cache.set(user_id, branch)
+        return branch
 
-    def is_admin(self, user_id: str) -> bool:
+    async def get_user(self, user_id: str) -> Dict:
+        """Get user details, served from cache while fresh"""
+        user_info = _user_cache.get(user_id)
+        if user_info is None:
+            user_info = await self.users.get(user_id)
+            _user_cache.set(user_id, user_info)
+        return user_info
+
+    def invalidate_user(self, user_id: str) -> None:
+        """Drop cached details for a user after it changes"""
+        _user_cache.pop(user_id)
+        _branch_cache.pop(user_id)
+
+    async def is_admin(self, user_id: str) -> bool:
         """Check if user has admin role"""  
-        user_info = self.users.get(user_id)
+        user_info = await self.get_user(user_id)
         return user_info.get('labels', []) == ['admin']
 
-    def create_branch(self, name: str) -> Dict:
+    async def create_branch(self, name: str) -> Dict:
         """Create a new branch team"""
         try:
             logger.info(f"Creating branch team: {name}")
-            team = self.teams.create(
+            team = await self.teams.create(
                 team_id='unique()',
                 name=name
             )
@@ -80,32 +113,40 @@ class AuthDatabase:
             logger.error(f"Failed to create branch: {e}")
             raise
 
-    def delete_user(self, user_id: str) -> bool:
+    async def delete_user(self, user_id: str) -> bool:
         """Delete a user and remove from teams"""
         try:
             logger.info(f"Deleting user: {user_id}")
-            self.users.delete(user_id)
+            await self.users.delete(user_id)
+            self.invalidate_user(user_id)
             logger.info("User deleted successfully")
             return True
         except Exception as e:
             logger.error(f"Failed to delete user: {e}")
             return False
 
-    def update_user(self, user_id: str, **updates) -> Dict:
+    async def update_user(self, user_id: str, **updates) -> Dict:
         """Update user details"""
         try:
             logger.info(f"Updating user {user_id}: {updates}")
-            user = self.users.update(user_id, **updates)
+            user = None
+            # Appwrite exposes one endpoint per user field
+            for field, value in updates.items():
+                update = getattr(self.users, f"update_{field}", None)
+                if update is None:
+                    raise ValueError(f"Unsupported user field: {field}")
+                user = await update(user_id, value)
+            self.invalidate_user(user_id)
             logger.info("User updated successfully")
             return user
         except Exception as e:
             logger.error(f"Failed to update user: {e}")
             raise
 
-    def get_user_role(self, user_id: str) -> UserRole:
+    async def get_user_role(self, user_id: str) -> UserRole:
         """Get user role based on their team membership"""
         try:
-            user_info = self.users.get(user_id)
+            user_info = await self.get_user(user_id)
             if 'labels' not in user_info:
                 logger.warning(f"User {user_id} has no labels, defaulting to 'member'")
                 return UserRole.MEMBER
@@ -120,4 +161,39 @@ class AuthDatabase:
                 return UserRole.MEMBER
         except Exception as e:
             logger.error(f"Failed to get user role: {e}")
-            return 'member'
\ No newline at end of file
+            return 'member'
+
+    async def session_claims(self, user_id: str) -> Dict:
+        """Resolve role, admin flag and branch once so they can be stored in the session"""
+        role = await self.get_user_role(user_id)
+        return {
+            "role": role.value if isinstance(role, UserRole) else role,
+            "is_admin": await self.is_admin(user_id),
+            "branch": await self.get_user_branch(user_id),
+            "claims_issued_at": time.time(),
+        }
+
+    @staticmethod
+    def _fresh_claims(user: Dict) -> bool:
+        # Claims cannot be revoked once in the cookie, so they are only trusted briefly;
+        # after that the (invalidatable) lookups decide, e.g. for a demoted admin
+        issued_at = user.get("claims_issued_at")
+        return issued_at is not None and time.time() - issued_at < settings.SESSION_CLAIMS_TTL
+
+    async def resolve_user_role(self, user: Dict) -> UserRole:
+        """Get user role from fresh session claims, falling back to Appwrite"""
+        if "role" in user and self._fresh_claims(user):
+            return UserRole(user["role"])
+        return await self.get_user_role(user["id"])
+
+    async def resolve_is_admin(self, user: Dict) -> bool:
+        """Get admin flag from fresh session claims, falling back to Appwrite"""
+        if "is_admin" in user and self._fresh_claims(user):
+            return user["is_admin"]
+        return await self.is_admin(user["id"])
+
+    async def resolve_user_branch(self, user: Dict) -> Optional[str]:
+        """Get branch from fresh session claims, falling back to Appwrite"""
+        if "branch" in user and self._fresh_claims(user):
+            return user["branch"]
+        return await self.get_user_branch(user["id"])
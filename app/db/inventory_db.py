@@ -1,4 +1,5 @@
-from typing import List, Optional, Dict
+from typing import Iterable, List, Optional, Dict, Tuple, Union
+from dataclasses import replace
 from datetime import datetime
 from appwrite.query import Query
 from appwrite.id import ID
@@ -7,11 +8,25 @@ from models.inventory import (
     InventoryChange,
     ItemUnit,
     StorageLocation,
-    Branch
+    Branch,
+    StockCountLine,
+    StockCountResult,
+    UnitConversionIndex
 )
-from core.appwrite_client import get_database
+from core.appwrite_client import get_database, iter_documents, iter_documents_in, collection_version
+from core.cache import TTLCache
+from core.concurrency import gather_limited
 from core.config import settings
 
+# Read-through caches shared by every InventoryDatabase instance; entries are
+# copies so callers can mutate what they get back without touching the cache
+_item_cache = TTLCache(maxsize=settings.INVENTORY_CACHE_SIZE, ttl=settings.INVENTORY_CACHE_TTL)
+_unit_cache = TTLCache(maxsize=settings.INVENTORY_CACHE_SIZE, ttl=settings.INVENTORY_CACHE_TTL)
+
+# Conversion factors, fetched per item the first time a conversion needs them
+# and again once the entry is older than UNIT_INDEX_TTL
+_unit_index = UnitConversionIndex(ttl=settings.UNIT_INDEX_TTL)
+
 class DocumentNotFoundError(Exception):
     """Custom exception for document not found errors"""
     def __init__(self, message: str):
@@ -23,32 +38,48 @@ class InventoryDatabase:
         self.database = get_database()
         self.database_id = settings.INVENTORY_DATABASE_ID
 
-    def get_all_items(self) -> list[InventoryItem]:
+    @staticmethod
+    def cache_stats() -> Dict[str, dict]:
+        """Hit/miss counters for the item and unit caches"""
+        return {"items": _item_cache.stats(), "units": _unit_cache.stats()}
+
+    @staticmethod
+    def _cache_item(item: InventoryItem) -> None:
+        _item_cache.set(item.id, replace(item))
+
+    @staticmethod
+    def _cache_units(item_id: str, units: List[ItemUnit]) -> None:
+        _unit_cache.set(item_id, [replace(unit) for unit in units])
+
+    async def get_all_items(self) -> list[InventoryItem]:
         """Get all inventory items"""
         try:
-            result = self.database.list_documents(
-                database_id=self.database_id,
-                collection_id='inventory'
-            )
-            return [InventoryItem.from_dict(doc) for doc in result['documents']]
+            documents = iter_documents(self.database, self.database_id, 'inventory')
+            return [InventoryItem.from_dict(doc) async for doc in documents]
         except Exception as e:
             return []
         
-    def get_items_by_storage(self, storage: str) -> List[InventoryItem]:
+    async def get_items_by_storage(self, storage: str) -> List[InventoryItem]:
         """Get all inventory items from a specific storage location"""
         try:
-            result = self.database.list_documents(
-                database_id=self.database_id,
-                collection_id='inventory',
+            documents = iter_documents(
+                self.database, self.database_id, 'inventory',
                 queries=[Query.equal('storage', storage)]
             )
-            return [InventoryItem.from_dict(doc) for doc in result['documents']]
+            return [InventoryItem.from_dict(doc) async for doc in documents]
         except Exception as e:
             return []
 
-    def search_items(self, query: str) -> List[InventoryItem]:
+    async def get_storage_version(self, storage: str) -> str:
+        """Version stamp of the items get_items_by_storage returns"""
+        return await collection_version(
+            self.database, self.database_id, 'inventory',
+            queries=[Query.equal('storage', storage)]
+        )
+
+    async def search_items(self, query: str) -> List[InventoryItem]:
         """Search inventory items by name"""
-        result = self.database.list_documents(
+        result = await self.database.list_documents(
             database_id=self.database_id,
             collection_id='inventory',
             queries=[
@@ -58,46 +89,104 @@ class InventoryDatabase:
         )
         return [InventoryItem.from_dict(doc) for doc in result['documents']]
     
-    def get_item(self, item_id: str) -> Optional[InventoryItem]:
-        """Get inventory item object by ID"""
+    async def get_item(self, item_id: str, fresh: bool = False) -> Optional[InventoryItem]:
+        """Get inventory item object by ID; `fresh` skips the cache for reads that feed a write"""
+        cached = None if fresh else _item_cache.get(item_id)
+        if cached is not None:
+            return replace(cached)
         try:
-            doc = self.database.get_document(
+            doc = await self.database.get_document(
                 database_id=self.database_id,
                 collection_id='inventory',
                 document_id=item_id
             )
-            return InventoryItem.from_dict(doc)
+            item = InventoryItem.from_dict(doc)
+            self._cache_item(item)
+            return item
         except Exception as e:
             return None
     
-    def get_item_secondary_units(self, item_id: str) -> List[ItemUnit]:
+    async def get_items_by_ids(self, item_ids: Iterable[str]) -> Dict[str, InventoryItem]:
+        """Fetch many items with batched queries, keyed by ID"""
+        documents = iter_documents_in(self.database, self.database_id, 'inventory', '$id', sorted(set(item_ids)))
+        return {doc['$id']: InventoryItem.from_dict(doc) async for doc in documents}
+
+    async def get_item_secondary_units(self, item_id: str) -> List[ItemUnit]:
         """Get all secondary units for a specific inventory item"""
+        cached = _unit_cache.get(item_id)
+        if cached is not None:
+            return [replace(unit) for unit in cached]
         try:
-            result = self.database.list_documents(
-                database_id=self.database_id,
-                collection_id='item_units',
+            documents = iter_documents(
+                self.database, self.database_id, 'item_units',
                 queries=[Query.equal('item_id', item_id)]
             )
-            return [ItemUnit.from_dict(doc) for doc in result['documents']]
+            units = [ItemUnit.from_dict(doc) async for doc in documents]
+            self._cache_units(item_id, units)
+            return units
         except Exception as e:
             print(f"Error fetching units for item {item_id}: {e}")
             return []
     
-    def convert_to_primary_unit(self, item_id: str, secondary_quantity: float, secondary_unit: str) -> float:
+    async def get_item_with_units(self, item_id: str) -> tuple[Optional[InventoryItem], List[ItemUnit]]:
+        """Fetch an item and its secondary units concurrently"""
+        return tuple(await gather_limited(
+            self.get_item(item_id),
+            self.get_item_secondary_units(item_id)
+        ))
+
+    @staticmethod
+    def _index_documents(item_docs: List[dict], unit_docs: List[dict]) -> None:
+        units_by_item: Dict[str, List[ItemUnit]] = {}
+        for doc in unit_docs:
+            unit = ItemUnit.from_dict(doc)
+            units_by_item.setdefault(unit.item_id, []).append(unit)
+        for doc in item_docs:
+            _unit_index.set_item(doc['$id'], doc['primary_unit'], units_by_item.get(doc['$id'], []))
+
+    async def _ensure_indexed(self, lines: Iterable[Tuple[str, str]]) -> None:
+        """Fetch conversion factors for the (item_id, unit) pairs the index has no fresh entry for"""
+        missing = sorted({item_id for item_id, unit in lines if not _unit_index.has_unit(item_id, unit)})
+        if not missing:
+            return
+
+        async def collect(collection_id: str, attribute: str) -> list:
+            documents = iter_documents_in(self.database, self.database_id, collection_id, attribute, missing)
+            return [doc async for doc in documents]
+
+        item_docs, unit_docs = await gather_limited(collect('inventory', '$id'), collect('item_units', 'item_id'))
+        self._index_documents(item_docs, unit_docs)
+
+    async def convert_to_primary_unit(self, item_id: str, secondary_quantity: float, secondary_unit: str,
+                                      primary_unit: Optional[str] = None) -> float:
         """Convert secondary unit quantity to primary unit quantity"""
-        units = self.get_item_secondary_units(item_id)
-        unit_obj = next((u for u in units if u.unit_name == secondary_unit), None)
-        
-        if not unit_obj:
-            raise ValueError(f"Secondary unit '{secondary_unit}' not found for item {item_id}")
-        
-        return secondary_quantity * unit_obj.conversion_to_primary
-    
-    def update_item_quantity(self, item_id: str, primary_quantity_change: float, 
+        if secondary_unit == primary_unit:
+            return secondary_quantity
+        await self._ensure_indexed([(item_id, secondary_unit)])
+        return _unit_index.convert(item_id, secondary_quantity, secondary_unit)
+
+    async def convert_many(self, lines: List[Tuple[str, float, str]],
+                           return_exceptions: bool = False) -> List[Union[float, ValueError]]:
+        """Convert many (item_id, quantity, unit) tuples to primary-unit quantities.
+
+        Factors for every item not freshly indexed are fetched in one batched
+        sweep before the whole list is converted.
+        """
+        await self._ensure_indexed((item_id, unit) for item_id, _, unit in lines)
+        return _unit_index.convert_many(lines, return_exceptions=return_exceptions)
+
+    async def get_unit_options(self, items: List[InventoryItem]) -> Dict[str, Dict[str, float]]:
+        """Unit name -> factor to primary for each item, read from the conversion index"""
+        await self._ensure_indexed((item.id, item.primary_unit) for item in items)
+        return {item.id: _unit_index.units(item.id) for item in items}
+
+    async def update_item_quantity(self, item_id: str, primary_quantity_change: float, 
                            original_unit: str, original_quantity: float,
                            storage: str, timestamp: datetime, user_id: str) -> bool:
         """Update item quantity with pre-calculated primary unit change"""
-        item = self.get_item(item_id)
+        # The new quantity is computed from the stored one, so a cached copy could
+        # overwrite changes made since by other workers, users or the console
+        item = await self.get_item(item_id, fresh=True)
         if not item:
             raise DocumentNotFoundError(f"Item {item_id} not found")
 
@@ -117,28 +206,112 @@ class InventoryDatabase:
         )
 
         try:
-            # Update item in database
-            self.database.update_document(
+            # Update item and log the change in parallel
+            updated_doc, _ = await gather_limited(
+                self.database.update_document(
+                    database_id=self.database_id,
+                    collection_id='inventory',
+                    document_id=item_id,
+                    data=item.to_json()
+                ),
+                self.database.create_document(
+                    database_id=self.database_id,
+                    collection_id='inventory_changes',
+                    document_id=change.id,
+                    data=change.to_json()
+                )
+            )
+
+            # Write-through so the next read sees the new quantity without a fetch
+            self._cache_item(InventoryItem.from_dict(updated_doc))
+            return True
+        except Exception as e:
+            # The stored quantity is unknown now; make the next read go to Appwrite
+            _item_cache.pop(item_id)
+            print(f"Error updating item {item_id}: {e}")
+            return False
+    
+    async def bulk_update_quantities(self, lines: List[StockCountLine],
+                                     timestamp: datetime, user_id: str) -> List[StockCountResult]:
+        """Apply many quantity adjustments at once and report the outcome of every line"""
+        # One batched read for the whole count
+        items = await self.get_items_by_ids(line.item_id for line in lines)
+        # Lines in a secondary unit are converted together; primary-unit lines need no factors
+        secondary = [index for index, line in enumerate(lines)
+                     if line.item_id in items and line.unit != items[line.item_id].primary_unit]
+        converted = dict(zip(secondary, await self.convert_many(
+            [(lines[index].item_id, lines[index].quantity, lines[index].unit) for index in secondary],
+            return_exceptions=True
+        )))
+
+        results = []
+        logged = []  # (result, change) pairs whose change record is written below
+        touched: Dict[str, InventoryItem] = {}
+        for index, line in enumerate(lines):
+            item = items.get(line.item_id)
+            if not item:
+                results.append(StockCountResult(line, False, error=f"Item {line.item_id} not found"))
+                continue
+            primary_quantity_change = converted.get(index, line.quantity)
+            if isinstance(primary_quantity_change, ValueError):
+                results.append(StockCountResult(line, False, item_name=item.name, error=str(primary_quantity_change)))
+                continue
+
+            # Several lines for one item fold into a single document update
+            item.quantity += primary_quantity_change
+            item.storage = line.storage
+            item.last_updated = timestamp
+            touched[item.id] = item
+
+            result = StockCountResult(line, True, item_name=item.name, primary_quantity_change=primary_quantity_change)
+            results.append(result)
+            logged.append((result, InventoryChange(
+                id=ID.unique(),
+                item_id=line.item_id,
+                change_quantity=line.quantity,
+                change_unit=line.unit,
+                timestamp=timestamp,
+                user_id=user_id
+            )))
+
+        outcomes = await gather_limited(
+            *(self.database.update_document(
                 database_id=self.database_id,
                 collection_id='inventory',
-                document_id=item_id,
+                document_id=item.id,
                 data=item.to_json()
-            )
-
-            # Log change
-            self.database.create_document(
+            ) for item in touched.values()),
+            *(self.database.create_document(
                 database_id=self.database_id,
                 collection_id='inventory_changes',
                 document_id=change.id,
                 data=change.to_json()
-            )
+            ) for _, change in logged),
+            limit=settings.INVENTORY_BULK_CONCURRENCY,
+            return_exceptions=True
+        )
+        item_outcomes = dict(zip(touched, outcomes[:len(touched)]))
+        change_outcomes = outcomes[len(touched):]
 
-            return True
-        except Exception as e:
-            print(f"Error updating item {item_id}: {e}")
-            return False
-    
-    def add_item_with_units(
+        for item_id, outcome in item_outcomes.items():
+            if isinstance(outcome, Exception):
+                _item_cache.pop(item_id)
+                print(f"Error updating item {item_id}: {outcome}")
+            else:
+                self._cache_item(InventoryItem.from_dict(outcome))
+
+        for (result, _), change_outcome in zip(logged, change_outcomes):
+            item_outcome = item_outcomes[result.line.item_id]
+            if isinstance(item_outcome, Exception):
+                result.success = False
+                result.error = str(item_outcome)
+                continue
+            result.new_quantity = float(item_outcome['quantity'])
+            if isinstance(change_outcome, Exception):
+                result.error = f"Quantity updated but change was not logged: {change_outcome}"
+        return results
+
+    async def add_item_with_units(
             self, item_name: str, initial_quantity: float, 
             primary_unit: str, storage: str = StorageLocation.KITCHEN.value,
             branch: str = Branch.Plano.value, additional_units: List[Dict] = None
@@ -154,14 +327,17 @@ class InventoryDatabase:
         )
         
         # Store item
-        self.database.create_document(
+        await self.database.create_document(
             database_id=self.database_id,
             collection_id='inventory',
             document_id=item.id,
             data=item.to_json()
         )
         
+        self._cache_item(item)
+        
         # Create additional units if provided
+        units = []
         if additional_units:
             for unit_data in additional_units:
                 unit_obj = ItemUnit.create_new(
@@ -170,11 +346,14 @@ class InventoryDatabase:
                     conversion_to_primary=float(unit_data['conversion'])
                 )
                 
-                self.database.create_document(
+                await self.database.create_document(
                     database_id=self.database_id,
                     collection_id='item_units',
                     document_id=unit_obj.id,
                     data=unit_obj.to_json()
                 )
+                units.append(unit_obj)
+        self._cache_units(item.id, units)
+        _unit_index.set_item(item.id, item.primary_unit, units)
         
         return item.id
\ No newline at end of file
@@ -1,6 +1,7 @@
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from models.order import Order, OrderItem, OrderStatus, OrderType
-from core.appwrite_client import get_database
+from core.appwrite_client import get_database, iter_documents, iter_documents_in, collection_version
+from core.concurrency import gather_limited
 from core.config import settings
 from appwrite.query import Query
 from appwrite.id import ID
@@ -14,10 +15,10 @@ class OrderDatabase:
         self.database = get_database()
         self.database_id = settings.DATABASE_ID
 
-    def create_order(self, branch_id: str, user_id: str) -> Order:
+    async def create_order(self, branch_id: str, user_id: str) -> Order:
         """Create a new draft order"""
         try:
-            order_data = self.database.create_document(
+            order_data = await self.database.create_document(
                 database_id=self.database_id,
                 collection_id='orders',
                 document_id=ID.unique(),
@@ -37,30 +38,45 @@ class OrderDatabase:
             logger.error(f"Failed to create draft order: {e}")
             raise
 
-    def get_branch_orders(self, branch_id: str) -> List[Order]:
+    async def get_items_for_orders(self, order_ids: List[str]) -> Dict[str, List[OrderItem]]:
+        """Fetch order items for many orders at once, grouped by order ID"""
+        grouped: Dict[str, List[OrderItem]] = {order_id: [] for order_id in order_ids}
+        async for doc in iter_documents_in(self.database, self.database_id, 'order_items', 'order_id', order_ids):
+            grouped.setdefault(doc['order_id'], []).append(OrderItem.from_dict(doc))
+        return grouped
+
+    async def _orders_with_items(self, order_docs: List[dict],
+                                 items_by_order: Optional[Dict[str, List[OrderItem]]] = None) -> List[Order]:
+        """Join order items onto order documents and build Order objects"""
+        if items_by_order is None:
+            items_by_order = await self.get_items_for_orders([doc['$id'] for doc in order_docs])
+        for doc in order_docs:
+            doc['items'] = items_by_order.get(doc['$id'], [])
+        return [Order.from_dict(doc) for doc in order_docs]
+
+    async def get_branch_orders(self, branch_id: str) -> List[Order]:
         """Get all orders for a branch"""
-        result = self.database.list_documents(
-            database_id=self.database_id,
-            collection_id='orders',
+        documents = iter_documents(
+            self.database, self.database_id, 'orders',
             queries=[
                 Query.equal('branch_id', branch_id),
                 Query.order_desc('created_at')
             ]
         )
-        if 'documents' in result:
-            # fetch order items for each order
-            for doc in result['documents']:
-                items_result = self.database.list_documents(
-                    database_id=self.database_id,
-                    collection_id='order_items',
-                    queries=[Query.equal('order_id', doc['$id'])]
-                )
-                doc['items'] = [OrderItem.from_dict(item) for item in items_result['documents']]
-        return [Order.from_dict(doc) for doc in result['documents']]
+        return await self._orders_with_items([doc async for doc in documents])
+
+    async def get_branch_orders_version(self, branch_id: str) -> Tuple[str, ...]:
+        """Version stamp of a branch's orders, drafts included, and their items"""
+        # Items cannot be filtered by branch, so any item change anywhere counts
+        return tuple(await gather_limited(
+            collection_version(self.database, self.database_id, 'orders',
+                               queries=[Query.equal('branch_id', branch_id)]),
+            collection_version(self.database, self.database_id, 'order_items')
+        ))
 
-    def get_draft_order(self, branch_id: str) -> Optional[Order]:
+    async def get_draft_order(self, branch_id: str) -> Optional[Order]:
         """Get active draft order for branch if exists"""
-        result = self.database.list_documents(
+        result = await self.database.list_documents(
             database_id=self.database_id,
             collection_id='orders',
             queries=[
@@ -73,21 +89,13 @@ class OrderDatabase:
         docs = result.get('documents', [])
         if not docs:
             return None
-        
-        # fetch order items for the draft order
-        items_result = self.database.list_documents(
-            database_id=self.database_id,
-            collection_id='order_items',
-            queries=[Query.equal('order_id', docs[0]['$id'])]
-        )
-        docs[0]['items'] = [OrderItem.from_dict(item) for item in items_result['documents']]
-        return Order.from_dict(docs[0]) if docs else None
+        return (await self._orders_with_items(docs))[0]
 
-    def add_order_item(self, order_id: str, product_name : str, product_id: str, quantity: int, units: list[str], notes: Optional[str] = None) -> OrderItem:
+    async def add_order_item(self, order_id: str, product_name : str, product_id: str, quantity: int, units: list[str], notes: Optional[str] = None) -> OrderItem:
         """Add item to order"""
         print(f'{product_name=}')
         try:
-            item_data = self.database.create_document(
+            item_data = await self.database.create_document(
                 database_id=self.database_id,
                 collection_id='order_items',
                 document_id=ID.unique(),
@@ -105,9 +113,9 @@ class OrderDatabase:
         except Exception as e:
             logger.error(f"Failed to add item to order {order_id}: {e}")
 
-    def submit_order(self, order_id: str) -> Order:
+    async def submit_order(self, order_id: str) -> Order:
         """Submit draft order"""
-        order_data = self.database.update_document(
+        order_data = await self.database.update_document(
             database_id=self.database_id,
             collection_id='orders',
             document_id=order_id,
@@ -118,9 +126,9 @@ class OrderDatabase:
         )
         return Order.from_dict(order_data)
 
-    def update_order_type(self, order_id: str, order_type: OrderType) -> Order:
+    async def update_order_type(self, order_id: str, order_type: OrderType) -> Order:
         """Update order type (admin only)"""
-        order_data = self.database.update_document(
+        order_data = await self.database.update_document(
             database_id=self.database_id,
             collection_id='orders',
             document_id=order_id,
@@ -130,43 +138,40 @@ class OrderDatabase:
         )
         return Order.from_dict(order_data)
     
-    def get_order_info(self, order_id: str) -> Optional[Order]:
+    async def get_order_info(self, order_id: str) -> Optional[Order]:
         """Get order details by ID"""
         try:
-            order_data = self.database.get_document(
-                database_id=self.database_id,
-                collection_id='orders',
-                document_id=order_id
-            )
-            items_result = self.database.list_documents(
-                database_id=self.database_id,
-                collection_id='order_items',
-                queries=[Query.equal('order_id', order_id)]
+            # The order and its items only depend on the order ID, so fetch both at once
+            order_data, items_by_order = await gather_limited(
+                self.database.get_document(
+                    database_id=self.database_id,
+                    collection_id='orders',
+                    document_id=order_id
+                ),
+                self.get_items_for_orders([order_id])
             )
-            order_data['items'] = [OrderItem.from_dict(item) for item in items_result['documents']]
-            return Order.from_dict(order_data)
+            return (await self._orders_with_items([order_data], items_by_order))[0]
         except Exception as e:
             logger.error(f"Failed to get order {order_id}: {e}")
             return None
         
-    def delete_order(self, order_id: str) -> bool:
+    async def delete_order(self, order_id: str) -> bool:
         """Delete an order by ID"""
         try:
             # First delete all items associated with this order
-            items_result = self.database.list_documents(
-                database_id=self.database_id,
-                collection_id='order_items',
+            items = [item async for item in iter_documents(
+                self.database, self.database_id, 'order_items',
                 queries=[Query.equal('order_id', order_id)]
-            )
-            for item in items_result['documents']:
-                self.database.delete_document(
+            )]
+            for item in items:
+                await self.database.delete_document(
                     database_id=self.database_id,
                     collection_id='order_items',
                     document_id=item['$id']
                 )
             
             # Now delete the order itself
-            self.database.delete_document(
+            await self.database.delete_document(
                 database_id=self.database_id,
                 collection_id='orders',
                 document_id=order_id
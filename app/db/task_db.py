@@ -1,8 +1,14 @@
+import hashlib
+from functools import partial
 from appwrite.query import Query
-from typing import List, Optional
-from core.appwrite_client import get_database
+from typing import Dict, List, Optional, Tuple
+from core.appwrite_client import get_database, iter_documents, iter_documents_in, collection_version
+from core.concurrency import gather_limited
+from core.batch_writer import BatchWriter
+from core.jobs import Operation
 from core.config import settings
 from appwrite.id import ID
+from appwrite.exception import AppwriteException
 from models.task import (
     Task,
     Subtask,
@@ -12,80 +18,148 @@ from datetime import datetime
 from logging import getLogger
 logger = getLogger(__name__)
 
+# Archive reads the statuses and notes that reset clears, so the two never overlap
+NIGHTLY_JOBS = "nightly_tasks"
+
 class TaskDatabase:
     def __init__(self):
         self.database = get_database()
         self.database_id = settings.TASKS_DATABASE_ID
 
-    def get_subtasks(self, task_id: str) -> List[Subtask]:
+    async def get_subtasks(self, task_id: str) -> List[Subtask]:
         """Fetch subtasks for a specific task"""
-        result = self.database.list_documents(
-            database_id=self.database_id,
-            collection_id='subtasks',
+        documents = iter_documents(
+            self.database, self.database_id, 'subtasks',
             queries=[
                 Query.equal('task_id', task_id),
                 Query.order_asc('order')
             ]
         )
-        return [Subtask.from_dict(doc) for doc in result['documents']]
+        return [Subtask.from_dict(doc) async for doc in documents]
+
+    async def get_subtasks_for_tasks(self, task_ids: List[str]) -> Dict[str, List[Subtask]]:
+        """Fetch subtasks for many tasks at once, grouped by task ID and sorted by order"""
+        grouped: Dict[str, List[Subtask]] = {task_id: [] for task_id in task_ids}
+        async for doc in iter_documents_in(self.database, self.database_id, 'subtasks', 'task_id', task_ids):
+            grouped.setdefault(doc['task_id'], []).append(Subtask.from_dict(doc))
+        for subtasks in grouped.values():
+            subtasks.sort(key=lambda st: st.order)
+        return grouped
         
-    def get_task(self, task_id: str) -> Optional[Task]:
+    async def get_task(self, task_id: str) -> Optional[Task]:
         """Fetch a single task by ID"""
-        task_doc = self.database.get_document(
-            database_id=self.database_id,
-            collection_id='tasks',
-            document_id=task_id
+        # Task document and its subtasks are independent lookups
+        task_doc, subtasks = await gather_limited(
+            self.database.get_document(
+                database_id=self.database_id,
+                collection_id='tasks',
+                document_id=task_id
+            ),
+            self.get_subtasks(task_id)
         )
-        # Get subtasks for this task
-        task_doc['subtasks'] = self.get_subtasks(task_id)
+        task_doc['subtasks'] = subtasks
 
         return Task.from_dict(task_doc)
 
         
-    def get_tasks(self) -> List[Task]:
+    async def get_tasks(self) -> List[Task]:
         """Fetch all tasks"""
-        tasks_result = self.database.list_documents(
-            database_id=self.database_id,
-            collection_id='tasks'
-        )
+        task_docs = [doc async for doc in iter_documents(self.database, self.database_id, 'tasks')]
+        # Load subtasks for every task in one batched sweep
+        subtasks_by_task = await self.get_subtasks_for_tasks([doc['$id'] for doc in task_docs])
         tasks = []
-        for task_doc in tasks_result['documents']:
-            # Get subtasks for each task
-            task_doc['subtasks'] = self.get_subtasks(task_doc['$id'])
-            # Get subtasks to task document
+        for task_doc in task_docs:
+            task_doc['subtasks'] = subtasks_by_task.get(task_doc['$id'], [])
             tasks.append(Task.from_dict(task_doc))
         return tasks
     
-    def update_task(self, task: Task) -> bool:
-        """Update task document"""
-        self.database.update_document(
-            database_id=self.database_id,
-            collection_id='tasks',
-            document_id=task.id,
-            data=task.to_json()
-        )
+    async def get_tasks_version(self) -> Tuple[str, ...]:
+        """Version stamp of everything get_tasks returns"""
+        return tuple(await gather_limited(
+            collection_version(self.database, self.database_id, 'tasks'),
+            collection_version(self.database, self.database_id, 'subtasks')
+        ))
+
+    async def update_task(self, task: Task, histories: List[TaskHistory] = ()) -> bool:
+        """Write only the changed fields of the task and its subtasks; history entries are queued for the background writer"""
+        writes = []
+        changed = []
+        task_changes = task.changes()
+        if task_changes:
+            writes.append(self.database.update_document(
+                database_id=self.database_id,
+                collection_id='tasks',
+                document_id=task.id,
+                data=task_changes
+            ))
+            changed.append(task)
         for subtask in task.subtasks:
-            self.database.update_document(
+            subtask_changes = subtask.changes()
+            if subtask_changes:
+                writes.append(self.database.update_document(
+                    database_id=self.database_id,
+                    collection_id='subtasks',
+                    document_id=subtask.id,
+                    data=subtask_changes
+                ))
+                changed.append(subtask)
+
+        await gather_limited(*writes)
+        for document in changed:
+            document.mark_clean()
+        self.record_history(*histories)
+        return True
+
+    def record_history(self, *histories: TaskHistory) -> None:
+        """Queue history entries for the background writer"""
+        history_writer.add(*histories)
+    
+    async def task_exists(self, task_id: str) -> bool:
+        """Whether a task document exists, without loading its subtasks"""
+        try:
+            await self.database.get_document(
                 database_id=self.database_id,
-                collection_id='subtasks',
-                document_id=subtask.id,
-                data=subtask.to_json()
+                collection_id='tasks',
+                document_id=task_id,
+                queries=[Query.select(['$id'])]
             )
+        except AppwriteException as e:
+            if e.code == 404:
+                return False
+            raise
         return True
-    
-    def add_history(self, history: TaskHistory) -> bool:
-        """Add new history entry"""
-        self.database.create_document(
+
+    async def update_task_notes(self, task_id: str, notes: str) -> Task:
+        """Write only the notes field of a task"""
+        doc = await self.database.update_document(
             database_id=self.database_id,
-            collection_id='task_history',
-            document_id=history.id if history.id else ID.unique(),
-            data=history.to_json()
+            collection_id='tasks',
+            document_id=task_id,
+            data={'notes': notes, 'last_updated': datetime.now().isoformat()}
         )
+        # Subtasks are untouched by a note edit, so they are not reloaded
+        return Task.from_dict({**doc, 'subtasks': []})
+
+    async def add_history(self, history: TaskHistory) -> bool:
+        """Add new history entry"""
+        if not history.id:
+            history.id = ID.unique()
+        try:
+            await self.database.create_document(
+                database_id=self.database_id,
+                collection_id='task_history',
+                document_id=history.id,
+                data=history.to_json()
+            )
+        except AppwriteException as e:
+            # A retry after a write that landed but timed out; the entry is already there
+            if e.code != 409:
+                raise
         return True
     
-    def get_task_history(self, task_id: str) -> List[TaskHistory]:
+    async def get_task_history(self, task_id: str) -> List[TaskHistory]:
         """Fetch history for a task"""
-        result = self.database.list_documents(
+        result = await self.database.list_documents(
             database_id=self.database_id,
             collection_id='task_history',
             queries=[
@@ -96,9 +170,9 @@ class TaskDatabase:
         return [TaskHistory.from_dict(doc) for doc in result['documents']]
 
         
-    def get_task_history(self, task_id: str) -> List[TaskHistory]:
+    async def get_task_history(self, task_id: str) -> List[TaskHistory]:
         """Fetch history for a task"""
-        result = self.database.list_documents(
+        result = await self.database.list_documents(
             database_id=self.database_id,
             collection_id='task_history',
             queries=[
@@ -108,120 +182,98 @@ class TaskDatabase:
         )
         return [TaskHistory.from_dict(doc) for doc in result['documents']]
     
-    def archive_subtasks(self, task_id: str, archive_timestamp: str) -> List[dict]:
-        """Archive subtasks for a specific task"""
-        try:
-            subtasks = self.get_subtasks(task_id)
-            archived_subtasks = []
-            
-            for subtask in subtasks:
-                # Create archive entry for each subtask
-                archived = self.database.create_document(
-                    database_id=self.database_id,
-                    collection_id='subtask_archives',
-                    document_id=ID.unique(),
-                    data={
-                        'task_id': task_id,
-                        'subtask_id': subtask.id,
-                        'archive_timestamp': archive_timestamp,
-                        'subtask_data': subtask.to_json(),
-                        'archived_at': datetime.now().isoformat()
-                    }
-                )
-                archived_subtasks.append(archived)
-                
-            logger.debug(f"Archived {len(archived_subtasks)} subtasks for task {task_id}")
-            return archived_subtasks
-            
-        except Exception as e:
-            logger.error(f"Failed to archive subtasks for task {task_id}: {e}")
-            return []
-
-    def reset_subtasks(self, task_id: str) -> bool:
-        """Reset all subtasks for a specific task"""
-        try:
-            subtasks = self.get_subtasks(task_id)
-            
-            for subtask in subtasks:
-                self.database.update_document(
-                    database_id=self.database_id,
-                    collection_id='subtasks',
-                    document_id=subtask.id,
-                    data={
-                        'status': False,
-                        'last_updated': datetime.now().isoformat()
-                    }
-                )
-                
-            logger.debug(f"Reset {len(subtasks)} subtasks for task {task_id}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to reset subtasks for task {task_id}: {e}")
-            return False
-
-    def archive_tasks(self) -> bool:
-        """Archive tasks and their subtasks"""
+    async def get_all_subtasks(self) -> Dict[str, List[Subtask]]:
+        """Sweep the whole subtasks collection once, grouped by task ID"""
+        grouped: Dict[str, List[Subtask]] = {}
+        async for doc in iter_documents(self.database, self.database_id, 'subtasks'):
+            grouped.setdefault(doc['task_id'], []).append(Subtask.from_dict(doc))
+        return grouped
+
+    async def _load_tasks_and_subtasks(self) -> Tuple[List[dict], Dict[str, List[Subtask]]]:
+        async def task_docs() -> List[dict]:
+            return [doc async for doc in iter_documents(self.database, self.database_id, 'tasks')]
+        return tuple(await gather_limited(task_docs(), self.get_all_subtasks()))
+
+    @staticmethod
+    def _archive_id(archive_timestamp: str, document_id: str) -> str:
+        # Deterministic so a retried or resumed write collides with the first one instead of duplicating it
+        return hashlib.sha1(f"{archive_timestamp}:{document_id}".encode()).hexdigest()[:36]
+
+    async def _create_once(self, collection_id: str, document_id: str, data: dict) -> None:
         try:
-            tasks_result = self.database.list_documents(
+            await self.database.create_document(
                 database_id=self.database_id,
-                collection_id='tasks'
+                collection_id=collection_id,
+                document_id=document_id,
+                data=data
             )
-            
-            archive_timestamp = datetime.now().strftime('%Y-%m-%d_%H:%M:%S')
-            
-            for task_doc in tasks_result['documents']:
-                task_id = task_doc['$id']
-                
-                # Archive subtasks first
-                archived_subtasks = self.archive_subtasks(task_id, archive_timestamp)
-                
-                # Store task archive with reference to archived subtasks
-                self.database.create_document(
-                    database_id=self.database_id,
-                    collection_id='task_archives',
-                    document_id=ID.unique(),
-                    data={
+        except AppwriteException as e:
+            if e.code != 409:
+                raise
+
+    async def plan_archive(self, archive_timestamp: Optional[str] = None) -> List[Operation]:
+        """Load every task and subtask in one sweep and return the archive writes"""
+        archive_timestamp = archive_timestamp or datetime.now().strftime('%Y-%m-%d_%H:%M:%S')
+        archived_at = datetime.now().isoformat()
+        task_docs, subtasks_by_task = await self._load_tasks_and_subtasks()
+
+        operations = []
+        for task_doc in task_docs:
+            task_id = task_doc['$id']
+            subtask_archive_ids = []
+            for subtask in subtasks_by_task.get(task_id, []):
+                archive_id = self._archive_id(archive_timestamp, subtask.id)
+                subtask_archive_ids.append(archive_id)
+                operations.append(Operation(f"subtask_archives:{subtask.id}", partial(
+                    self._create_once, 'subtask_archives', archive_id, {
                         'task_id': task_id,
+                        'subtask_id': subtask.id,
                         'archive_timestamp': archive_timestamp,
-                        'task_data': task_doc,
-                        'subtasks_data': [s['$id'] for s in archived_subtasks],
-                        'archived_at': datetime.now().isoformat()
-                    }
-                )
-            
-            return True
-        except Exception as e:
-            logger.error(f"Failed to archive tasks: {e}")
-            return False
-
-    def reset_tasks(self) -> bool:
-        """Reset tasks and their subtasks"""
-        try:
-            tasks_result = self.database.list_documents(
+                        'subtask_data': subtask.to_json(),
+                        'archived_at': archived_at
+                    })))
+            # Archive IDs are known up front, so the task entry need not wait for its subtasks
+            operations.append(Operation(f"task_archives:{task_id}", partial(
+                self._create_once, 'task_archives', self._archive_id(archive_timestamp, task_id), {
+                    'task_id': task_id,
+                    'archive_timestamp': archive_timestamp,
+                    'task_data': task_doc,
+                    'subtasks_data': subtask_archive_ids,
+                    'archived_at': archived_at
+                })))
+        return operations
+
+    async def plan_reset(self) -> List[Operation]:
+        """Load every task and subtask in one sweep and return the writes that reset them"""
+        task_docs, subtasks_by_task = await self._load_tasks_and_subtasks()
+        now = datetime.now().isoformat()
+
+        def reset(collection_id: str, document_id: str, data: dict) -> Operation:
+            return Operation(f"{collection_id}:{document_id}", partial(
+                self.database.update_document,
                 database_id=self.database_id,
-                collection_id='tasks'
-            )
-            
-            for task_doc in tasks_result['documents']:
-                task_id = task_doc['$id']
-                
-                # Reset main task
-                self.database.update_document(
-                    database_id=self.database_id,
-                    collection_id='tasks',
-                    document_id=task_id,
-                    data={
-                        'status': False,
-                        'notes': "",
-                        'last_updated': datetime.now().isoformat()
-                    }
-                )
-                
-                # Reset associated subtasks
-                self.reset_subtasks(task_id)
-            
-            return True
-        except Exception as e:
-            logger.error(f"Failed to reset tasks: {e}")
-            return False
\ No newline at end of file
+                collection_id=collection_id,
+                document_id=document_id,
+                data={**data, 'last_updated': now}
+            ))
+
+        # Documents already in their reset state are skipped
+        operations = [
+            reset('tasks', doc['$id'], {'status': False, 'notes': ""})
+            for doc in task_docs if doc.get('status') or doc.get('notes')
+        ]
+        operations.extend(
+            reset('subtasks', subtask.id, {'status': False})
+            for subtasks in subtasks_by_task.values() for subtask in subtasks if subtask.status
+        )
+        return operations
+
+# Audit entries are written off the request path; drained on shutdown
+history_writer = BatchWriter(
+    TaskDatabase().add_history,
+    name="task history",
+    batch_size=settings.HISTORY_BATCH_SIZE,
+    flush_interval=settings.HISTORY_FLUSH_INTERVAL,
+    concurrency=settings.APPWRITE_FANOUT_LIMIT,
+    max_retries=settings.HISTORY_MAX_RETRIES
+)
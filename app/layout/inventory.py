@@ -2,14 +2,17 @@ from fasthtml.common import *
 from models.inventory import (
     InventoryItem,
     ItemUnit,
+    StockCountResult,
     StorageLocation
 )
-from typing import List
+from typing import Dict, List
 from components.success_message import success_message
+from core.fragments import memoize_fragment
 
 from db.inventory_db import InventoryDatabase
 inventory_db = InventoryDatabase()
 
+@memoize_fragment
 def storage_location_selector(current_storage: str = None) -> Div:
     """Storage location button selector"""
     default_storage = current_storage or StorageLocation.KITCHEN.value
@@ -32,6 +35,7 @@ def storage_location_selector(current_storage: str = None) -> Div:
         Input(type="hidden", name="storage", id="selected-storage", value=current_storage or StorageLocation.WAREHOUSE.value)
     )
 
+@memoize_fragment
 def inventory_search_bar() -> Div:
     """Search bar with live suggestions"""
     return Div(
@@ -128,6 +132,7 @@ def quantity_adjuster(item: InventoryItem, secondary_units: List[ItemUnit]) -> F
         ),
     )
 
+@memoize_fragment
 def inventory_edit_view() -> Div:
     """Container for inventory edit form"""
     return Div(cls="p-4")(
@@ -136,6 +141,93 @@ def inventory_edit_view() -> Div:
         Div(id="item-form", cls="mt-6")
     )
 
+@memoize_fragment
+def bulk_count_view() -> Div:
+    """Stock count form: one quantity/unit row per item in the selected storage"""
+    return Div(cls="p-4 space-y-4")(
+        Div(cls="space-y-2")(
+            Label("Storage Location:", cls="block text-sm font-medium text-gray-700"),
+            Select(
+                name="storage",
+                hx_get="/inventory/bulk/rows",
+                hx_target="#bulk-rows",
+                hx_trigger="change",
+                cls="w-full border rounded-lg px-3 py-2"
+            )(
+                *(Option(value=location.value, selected=location == StorageLocation.KITCHEN)(
+                    location.value.replace('_', ' ').title()
+                ) for location in StorageLocation)
+            )
+        ),
+        Div(
+            id="bulk-rows",
+            hx_get=f"/inventory/bulk/rows?storage={StorageLocation.KITCHEN.value}",
+            hx_trigger="load",
+            hx_swap="innerHTML"
+        )(
+            P("Loading items...", cls="text-center text-gray-500 p-4")
+        ),
+        Div(id="bulk-summary")
+    )
+
+def bulk_count_rows(items: List[InventoryItem], unit_options: Dict[str, Dict[str, float]], storage: str) -> Div:
+    """Rows of the stock count form for one storage location"""
+    if not items:
+        return P(f"No items found in {storage.replace('_', ' ').title()} storage", cls="text-center text-gray-500 p-4")
+
+    return Form(
+        id="bulk-count-form",
+        hx_post="/inventory/bulk-update",
+        hx_target="#bulk-summary",
+        hx_swap="innerHTML",
+        hx_indicator="#bulk-indicator",
+        cls="space-y-2"
+    )(
+        Input(type="hidden", name="storage", value=storage),
+        P(cls="text-xs text-gray-500")(
+            "Enter the change for each counted item; leave blank or 0 to skip"
+        ),
+        *(
+            Div(cls="grid grid-cols-3 gap-2 items-center border-b py-2")(
+                Input(type="hidden", name="item_id", value=item.id),
+                Div(
+                    Div(item.name, cls="font-medium"),
+                    Div(f"{item.quantity} {item.primary_unit}", cls="text-xs text-gray-500")
+                ),
+                Input(type="number", name=f"quantity_{item.id}", step="0.01",
+                      placeholder="0", cls="w-full text-center border rounded-lg"),
+                Select(name=f"unit_{item.id}", cls="w-full border rounded-lg px-2 py-1")(
+                    *(Option(value=unit_name)(
+                        f"{unit_name} (primary)" if unit_name == item.primary_unit else unit_name
+                    ) for unit_name in unit_options.get(item.id, {item.primary_unit: 1.0}))
+                )
+            ) for item in items
+        ),
+        Button(type="submit", cls="w-full mt-4 bg-blue-500 text-white py-2 px-4 rounded-lg hover:bg-blue-600")(
+            "Apply Count",
+            Span(id="bulk-indicator", cls="htmx-indicator ml-2")("...")
+        )
+    )
+
+def bulk_count_summary(results: List[StockCountResult]) -> Div:
+    """Per-line outcome of a bulk stock count"""
+    failed = [result for result in results if not result.success]
+    return Div(cls="space-y-2 mt-4")(
+        P(cls="text-sm font-medium " + ("text-red-600" if failed else "text-green-600"))(
+            f"{len(results) - len(failed)} of {len(results)} line{'s' if len(results) != 1 else ''} applied"
+        ),
+        Ul(cls="text-sm divide-y")(
+            *(
+                Li(cls="py-1 " + ("text-gray-700" if result.success else "text-red-600"))(
+                    f"{result.item_name or result.line.item_id}: {result.line.quantity} {result.line.unit} → "
+                    + (f"{result.new_quantity}" if result.new_quantity is not None else "failed")
+                    + (f" ({result.error})" if result.error else "")
+                ) for result in results
+            )
+        )
+    )
+
+@memoize_fragment
 def inventory_table_view() -> Div:
     """Enhanced table view with form-wrapped storage filtering"""
     return Div(
@@ -248,6 +340,7 @@ def render_items_table(items: List[InventoryItem], storage_location: str) -> Div
         )
     )
 
+@memoize_fragment
 def unit_input_component(tier: int = 0) -> Div:
     """
     Reusable unit input component for primary (tier=0) and secondary (tier=1) units
@@ -298,6 +391,7 @@ def unit_input_component(tier: int = 0) -> Div:
         )("+ Add secondary unit") if is_primary else ""
     )
 
+@memoize_fragment
 def inventory_add_item() -> Form:
     """Form to add a new inventory item with storage selection"""
     return Form(
@@ -354,6 +448,7 @@ def inventory_add_item() -> Form:
         """)
     )
 
+@memoize_fragment
 def inventory_tabs(is_admin: bool = False) -> Div:
     """Render the inventory tabs with lazy loading"""
     return Div(cls="flex flex-col gap-2")(
@@ -402,6 +497,25 @@ def inventory_tabs(is_admin: bool = False) -> Div:
                 # Empty initially - will be loaded when tab is clicked
                 P("Loading...", cls="text-center text-gray-500")
             ),
+            Input(
+                type="radio",
+                name="inventory_tab",
+                role="tab",
+                cls="tab",
+                id="count-tab",
+                aria_label="Count",
+                hx_trigger="change",
+                hx_get="/inventory/tab/count",
+                hx_target="#count-content"
+            ),
+            Div(
+                role="tabpanel",
+                cls="tab-content bg-base-100 border-base-300 rounded-box p-6",
+                id="count-content"
+            )(
+                # Empty initially - will be loaded when tab is clicked
+                P("Loading...", cls="text-center text-gray-500")
+            ),
             *([] if not is_admin else [
                 Input(
                     type="radio",
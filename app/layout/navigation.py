@@ -3,6 +3,7 @@ from typing import List, Tuple, Optional
 from fasthtml.common import *
 from models.user import UserRole
 from db.auth import AuthDatabase
+from core.fragments import memoize_fragment
 
 class NavigationButton:
     def __init__(self, label: str, href: str, time_window: Optional[Tuple[time, time]] = None):
@@ -74,6 +75,11 @@ def get_navigation_buttons(user_role: UserRole) -> List[NavigationButton]:
     
     return buttons
 
+def _navigation_key(user_role: UserRole) -> tuple:
+    # Time-windowed buttons render differently once their window opens or closes
+    return user_role, tuple(button.is_enabled() for button in get_navigation_buttons(user_role))
+
+@memoize_fragment(key=_navigation_key)
 def render_main_navigation(user_role: UserRole) -> Div:
     """Render main navigation buttons"""
     buttons = get_navigation_buttons(user_role)
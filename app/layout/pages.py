@@ -22,6 +22,8 @@ def TasksPage(tasks: list[Task]) -> AppContainer:
                 Button(
                     Icon("refresh", cls="w-4 h-4"),
                     hx_get="/tasks",
+                    # The server sends Resync when it dropped this client for falling behind
+                    hx_trigger="click, sse:Resync",
                     hx_target="body",
                     hx_swap="innerHTML",
                     cls="btn btn-outline btn-square btn-sm border-gray-300 hover:bg-gray-100 !rounded-md"
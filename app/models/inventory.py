@@ -1,8 +1,9 @@
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable, List, Tuple, Union
 from appwrite.id import ID
 from enum import Enum
+import time
 
 class StorageLocation(Enum):
     WAREHOUSE = "warehouse"
@@ -136,4 +137,100 @@ class InventoryChange:
             "change_unit": self.change_unit,
             "timestamp": self.timestamp.isoformat() if isinstance(self.timestamp, datetime) else self.timestamp,
             "user_id": self.user_id
-        }
\ No newline at end of file
+        }
+
+@dataclass
+class StockCountLine:
+    """One (item, quantity, unit, storage) adjustment of a bulk stock count"""
+    item_id: str
+    quantity: float
+    unit: str
+    storage: str
+
+@dataclass
+class StockCountResult:
+    """Outcome of applying one StockCountLine"""
+    line: StockCountLine
+    success: bool
+    item_name: Optional[str] = None
+    primary_quantity_change: Optional[float] = None
+    new_quantity: Optional[float] = None
+    error: Optional[str] = None
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "item_id": self.line.item_id,
+            "item_name": self.item_name,
+            "quantity": self.line.quantity,
+            "unit": self.line.unit,
+            "storage": self.line.storage,
+            "success": self.success,
+            "primary_quantity_change": self.primary_quantity_change,
+            "new_quantity": self.new_quantity,
+            "error": self.error
+        }
+
+class UnitConversionIndex:
+    """In-memory item_id -> unit_name -> factor-to-primary lookup table.
+
+    Entries are filled per item on demand and go stale `ttl` seconds after
+    they were set, so factors edited elsewhere are picked up again.
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl
+        self._factors: Dict[str, Dict[str, float]] = {}
+        self._loaded_at: Dict[str, float] = {}
+
+    def is_fresh(self, item_id: str) -> bool:
+        loaded_at = self._loaded_at.get(item_id)
+        if loaded_at is None:
+            return False
+        return self.ttl is None or time.monotonic() - loaded_at < self.ttl
+
+    def has_unit(self, item_id: str, unit_name: str) -> bool:
+        """Whether a fresh entry for the item knows the unit"""
+        return self.is_fresh(item_id) and unit_name in self._factors[item_id]
+
+    def units(self, item_id: str) -> Dict[str, float]:
+        """Unit name -> factor to primary for an item, primary unit first"""
+        return dict(self._factors.get(item_id, {}))
+
+    def set_item(self, item_id: str, primary_unit: str, units: Iterable[ItemUnit]) -> None:
+        """Replace the conversion table for an item; the primary unit has factor 1.0"""
+        factors = {primary_unit: 1.0}
+        factors.update({unit.unit_name: unit.conversion_to_primary for unit in units})
+        self._factors[item_id] = factors
+        self._loaded_at[item_id] = time.monotonic()
+
+    def factor(self, item_id: str, from_unit: str, to_unit: Optional[str] = None) -> float:
+        """Factor converting from_unit to to_unit (the primary unit when omitted), chaining through the primary unit"""
+        factors = self._factors.get(item_id, {})
+        if from_unit not in factors:
+            raise ValueError(f"Secondary unit '{from_unit}' not found for item {item_id}")
+        if to_unit is None:
+            return factors[from_unit]
+        if to_unit not in factors:
+            raise ValueError(f"Secondary unit '{to_unit}' not found for item {item_id}")
+        return factors[from_unit] / factors[to_unit]
+
+    def convert(self, item_id: str, quantity: float, unit: str, to_unit: Optional[str] = None) -> float:
+        """Convert a quantity of one unit into another (primary by default)"""
+        return quantity * self.factor(item_id, unit, to_unit)
+
+    def convert_many(self, lines: Iterable[Tuple[str, float, str]],
+                     return_exceptions: bool = False) -> List[Union[float, ValueError]]:
+        """Convert many (item_id, quantity, unit) tuples to primary-unit quantities in one pass.
+
+        With return_exceptions, a line whose unit is unknown yields its
+        ValueError in place instead of failing the whole batch.
+        """
+        results: List[Union[float, ValueError]] = []
+        for item_id, quantity, unit in lines:
+            try:
+                results.append(quantity * self.factor(item_id, unit))
+            except ValueError as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
@@ -1,17 +1,32 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from enum import Enum
 from appwrite.id import ID
 
+class ChangeTracking:
+    """Field-level change sets against the state last loaded from or written to Appwrite"""
+
+    def mark_clean(self) -> None:
+        """Record the current state as what Appwrite holds"""
+        self._clean = self.to_json()
+
+    def changes(self) -> Dict[str, Any]:
+        """Fields that differ from the clean state; everything for a never-saved object"""
+        current = self.to_json()
+        if self._clean is None:
+            return current
+        return {key: value for key, value in current.items() if self._clean.get(key) != value}
+
 @dataclass
-class Subtask:
+class Subtask(ChangeTracking):
     id: str
     title: str
     task_id: str
     status: bool
     last_updated: datetime
     order: int
+    _clean: Optional[Dict[str, Any]] = field(default=None, init=False, repr=False, compare=False)
 
     def toggle_status(self) -> None:
         """Toggle subtask completion status"""
@@ -20,7 +35,7 @@ class Subtask:
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Subtask':
         """Create Subtask from Appwrite document"""
-        return cls(
+        subtask = cls(
             id=data["$id"],
             task_id=data['task_id'],
             title=data['title'],
@@ -28,6 +43,8 @@ class Subtask:
             last_updated=data['last_updated'],
             order=data['order']
         )
+        subtask.mark_clean()
+        return subtask
 
     def to_json(self) -> Dict[str, Any]:
         """Convert subtask to JSON-compatible dict"""
@@ -40,13 +57,14 @@ class Subtask:
         }
 
 @dataclass
-class Task:
+class Task(ChangeTracking):
     id: str
     title: str
     subtasks: List[Subtask]
     notes: str
     status: bool
     last_updated: datetime
+    _clean: Optional[Dict[str, Any]] = field(default=None, init=False, repr=False, compare=False)
 
     def toggle_status(self) -> None:
         """Toggle task completion status"""
@@ -73,7 +91,7 @@ class Task:
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Task':
         """Create Task from Appwrite document"""
-        return cls(
+        task = cls(
             id=data.get('$id', data.get('id')),  # Handle both $id and id
             title=data['title'],
             subtasks=data['subtasks'],
@@ -81,6 +99,8 @@ class Task:
             status=data['status'],
             last_updated=data['last_updated']
         )
+        task.mark_clean()
+        return task
 
     def to_json(self) -> Dict[str, Any]:
         """Convert task to JSON-compatible dict"""
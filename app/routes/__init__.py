@@ -3,4 +3,5 @@ from . import main
 from . import tasks
 from . import inventory
 from . import profile
-from . import orders
\ No newline at end of file
+from . import orders
+from . import admin
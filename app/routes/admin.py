@@ -1,28 +1,62 @@
 from core.app import rt
-from fasthtml import Header, HTTPException
-from db.task_db import TaskDatabase
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+from db.task_db import TaskDatabase, NIGHTLY_JOBS
 import logging
 from core.config import settings
+from core.jobs import job_runner
 
 logger = logging.getLogger(__name__)
 db = TaskDatabase()
 
-async def verify_webhook_secret(x_github_token: str = Header(None)):
+# Route handlers get x_github_token from the X-Github-Token header
+async def verify_webhook_secret(x_github_token: str = None):
     if settings.GITHUB_WEBHOOK_SECRET is None:
         raise HTTPException(status_code=500, detail="GitHub webhook secret not configured")
     if x_github_token != settings.GITHUB_WEBHOOK_SECRET:
         raise HTTPException(status_code=403, detail="Invalid webhook secret")
 
 @rt("/admin/tasks/archive", methods=["POST"])
-async def archive_tasks_endpoint(x_github_token: str = Header(None)):
+async def archive_tasks_endpoint(x_github_token: str = None, wait: bool = False):
     await verify_webhook_secret(x_github_token)
     logger.info("Archiving tasks via GitHub Action")
-    success = db.archive_tasks()
-    return {"success": success}
+    job = job_runner.submit("archive_tasks", db.plan_archive, exclusive=NIGHTLY_JOBS)
+    return await job_response(job, wait)
 
 @rt("/admin/tasks/reset", methods=["POST"])
-async def reset_tasks_endpoint(x_github_token: str = Header(None)):
+async def reset_tasks_endpoint(x_github_token: str = None, wait: bool = False):
     await verify_webhook_secret(x_github_token)
     logger.info("Resetting tasks via GitHub Action")
-    success = db.reset_tasks()
-    return {"success": success}
\ No newline at end of file
+    job = job_runner.submit("reset_tasks", db.plan_reset, exclusive=NIGHTLY_JOBS)
+    return await job_response(job, wait)
+
+@rt("/admin/jobs/{job_id}")
+async def job_status_endpoint(job_id: str, x_github_token: str = None):
+    await verify_webhook_secret(x_github_token)
+    job = job_runner.get(job_id)
+    if job is None:
+        # Job state is kept per worker; see core/jobs.py
+        raise HTTPException(status_code=404, detail="Job not found on this worker")
+    return job.to_json()
+
+@rt("/admin/jobs/{job_id}/resume", methods=["POST"])
+async def resume_job_endpoint(job_id: str, x_github_token: str = None, wait: bool = False):
+    await verify_webhook_secret(x_github_token)
+    job = job_runner.resume(job_id)
+    if job is None:
+        # Job state is kept per worker; see core/jobs.py
+        raise HTTPException(status_code=404, detail="Job not found on this worker")
+    logger.info(f"Resuming job {job_id}")
+    return await job_response(job, wait)
+
+async def job_response(job, wait: bool) -> JSONResponse:
+    """Job summary: 202 straight away, or 200 once the job has finished with ?wait=1"""
+    if wait:
+        job = await job_runner.wait(job.id)
+    finished = job.status in ("completed", "failed")
+    return JSONResponse({
+        "success": job.status != "failed",
+        "job_id": job.id,
+        "status_url": f"/admin/jobs/{job.id}",
+        **job.to_json()
+    }, status_code=200 if finished else 202)
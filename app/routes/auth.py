@@ -7,6 +7,7 @@ import urllib.parse
 from appwrite.services.account import Account
 from core.app import rt
 from auth.oauth import verify_oauth_token
+from db.auth import AuthDatabase
 
 
 @rt("/login", methods=["GET"])
@@ -182,6 +183,8 @@ async def oauth_token(req, session):
                 status_code=303
             )
         
+        if settings.SESSION_AUTH_CLAIMS:
+            user_data.update(await AuthDatabase().session_claims(user_data["id"]))
         session["user"] = user_data
         print(f"✅ FastHTML session set for user: {user_data}")
         return RedirectResponse("/", status_code=303)
@@ -8,15 +8,20 @@ from layout.inventory import (
     inventory_edit_view,
     inventory_table_view,
     inventory_add_item,
-    render_items_table
+    render_items_table,
+    bulk_count_view,
+    bulk_count_rows,
+    bulk_count_summary
 )
 from db.inventory_db import InventoryDatabase
 from db.auth import AuthDatabase
-from models.inventory import StorageLocation
+from models.inventory import StorageLocation, StockCountLine
 from datetime import datetime
 from components.success_message import success_message
+from core.conditional import view_etag, etag_matches, etag_headers, not_modified
 
 db = InventoryDatabase()
+auth_db = AuthDatabase()
 
 @rt('/inventory')
 async def inventory(session):
@@ -24,7 +29,7 @@ async def inventory(session):
     # Check if user is admin
     user_id = session.get("user", {}).get("id")
     print(f"User ID: {user_id}")  # Debugging line
-    is_admin = AuthDatabase().get_user_role(user_id) if user_id else False
+    is_admin = await auth_db.resolve_user_role(session["user"]) if user_id else False
     print(f"Is Admin: {is_admin}")
     return InventoryPage(is_admin=is_admin)
 
@@ -43,6 +48,69 @@ async def get_add_tab():
     """Get add tab content"""
     return inventory_add_item()
 
+@rt('/inventory/tab/count')
+async def get_count_tab():
+    """Get stock count tab content"""
+    return bulk_count_view()
+
+@rt('/inventory/bulk/rows')
+async def get_bulk_rows(storage: str = StorageLocation.KITCHEN.value):
+    """Stock count rows for one storage location"""
+    if storage not in [loc.value for loc in StorageLocation]:
+        return "Invalid storage location", 400
+
+    items = await db.get_items_by_storage(storage)
+    unit_options = await db.get_unit_options(items)
+    return bulk_count_rows(items, unit_options, storage)
+
+@rt('/inventory/bulk-update', methods=['POST'])
+async def bulk_update_inventory(req, session):
+    """Apply many inventory adjustments in one request.
+
+    Accepts the stock count form, or JSON of the form
+    {"lines": [{"item_id", "quantity", "unit", "storage"}, ...]} and then answers in JSON.
+    """
+    is_json = req.headers.get('content-type', '').startswith('application/json')
+    try:
+        if is_json:
+            body = await req.json()
+            lines = [
+                StockCountLine(
+                    item_id=line['item_id'],
+                    quantity=float(line['quantity']),
+                    unit=line['unit'],
+                    storage=line.get('storage', StorageLocation.KITCHEN.value)
+                ) for line in body.get('lines', [])
+            ]
+        else:
+            data = await req.form()
+            storage = data.get('storage', StorageLocation.KITCHEN.value)
+            lines = [
+                StockCountLine(
+                    item_id=item_id,
+                    quantity=float(data.get(f'quantity_{item_id}')),
+                    unit=data.get(f'unit_{item_id}', ''),
+                    storage=storage
+                ) for item_id in data.getlist('item_id')
+                if data.get(f'quantity_{item_id}') not in (None, '')
+            ]
+    except (KeyError, TypeError, ValueError) as e:
+        return f"Invalid stock count: {str(e)}", 400
+
+    valid_locations = [loc.value for loc in StorageLocation]
+    if any(line.storage not in valid_locations for line in lines):
+        return "Invalid storage location", 400
+
+    # Zero lines are no-ops, same as the single-item update
+    lines = [line for line in lines if line.quantity != 0]
+    if not lines:
+        return "No quantity change specified", 400
+
+    results = await db.bulk_update_quantities(lines, timestamp=datetime.now(), user_id=session["user"]["id"])
+    if is_json:
+        return JSONResponse({"results": [result.to_json() for result in results]})
+    return bulk_count_summary(results)
+
 @rt('/inventory/search', methods=['POST'])
 async def search_items(req):
     """Search items by name"""
@@ -51,7 +119,7 @@ async def search_items(req):
     if len(query) < 2:
         return ""
     
-    items = db.search_items(query)
+    items = await db.search_items(query)
     return Div(cls="bg-white rounded-b-lg")(
         *(search_result_item(item) for item in items)
     )
@@ -59,11 +127,10 @@ async def search_items(req):
 @rt('/inventory/select/{item_id}')
 async def select_item(item_id: str):
     """Get item form when selected"""
-    item = db.get_item(item_id)
+    item, secondary_units = await db.get_item_with_units(item_id)
     if not item:
         return "Item not found", 404
     
-    secondary_units = db.get_item_secondary_units(item_id)
     return quantity_adjuster(item, secondary_units)
 
 @rt('/inventory/update/{item_id}', methods=['POST'])
@@ -79,21 +146,16 @@ async def update_inventory(req, session, item_id: str):
         return "No quantity change specified", 400
     
     try:
-        # Get the item to check primary unit
-        item = db.get_item(item_id)
+        # Get the item to check it exists
+        item = await db.get_item(item_id)
         if not item:
             return "Item not found", 404
         
-        # Calculate primary unit change
-        if unit == item.primary_unit:
-            # Already in primary units
-            primary_quantity_change = quantity
-        else:
-            # Convert from secondary unit to primary unit
-            primary_quantity_change = db.convert_to_primary_unit(item_id, quantity, unit)
+        # Calculate primary unit change; quantities in the primary unit need no lookup
+        primary_quantity_change = await db.convert_to_primary_unit(item_id, quantity, unit, item.primary_unit)
         
         # Update the database
-        success = db.update_item_quantity(
+        success = await db.update_item_quantity(
             item_id=item_id,
             primary_quantity_change=primary_quantity_change,
             original_unit=unit,
@@ -105,7 +167,7 @@ async def update_inventory(req, session, item_id: str):
         
         if success:
             # Return success message with item details
-            updated_item = db.get_item(item_id)
+            updated_item = await db.get_item(item_id)
             message = f"✓ {updated_item.name} updated! New quantity: {updated_item.quantity} {updated_item.primary_unit}"
             
             return Div(
@@ -132,7 +194,7 @@ async def add_inventory_item(req):
     quantity = float(data.get('quantity', 1))
     primary_unit = data.get('unit_name_0', '').strip()
     storage = data.get('storage', StorageLocation.KITCHEN.value)
-    branch = AuthDatabase().get_user_branch(data.get('user_id', ''))
+    branch = await auth_db.get_user_branch(data.get('user_id', ''))
     
     if not item_name or not primary_unit:
         return "Name and primary unit are required", 400
@@ -153,7 +215,7 @@ async def add_inventory_item(req):
             return "Invalid conversion rate", 400
     
     try:
-        item_id = db.add_item_with_units(
+        item_id = await db.add_item_with_units(
             item_name=item_name,
             initial_quantity=quantity,
             primary_unit=primary_unit,
@@ -202,21 +264,26 @@ async def filter_table_by_storage(req):
         return "Invalid storage location", 400
     
     # Get items from database
-    items = db.get_items_by_storage(storage_location)
+    items = await db.get_items_by_storage(storage_location)
     
     # Return the rendered table
     return render_items_table(items, storage_location)
 
 @rt('/inventory/table/{storage_location}')
-async def get_items_by_storage(storage_location: str):
+async def get_items_by_storage(req, storage_location: str):
     """Get items filtered by storage location (for initial load)"""
     # Validate storage location
     valid_locations = [loc.value for loc in StorageLocation]
     if storage_location not in valid_locations:
         return "Invalid storage location", 400
+
+    # Unchanged since the client's copy: skip loading and rendering altogether
+    etag = await view_etag(req, db.get_storage_version(storage_location), storage_location)
+    if etag_matches(req, etag):
+        return not_modified(etag)
     
     # Get items from database
-    items = db.get_items_by_storage(storage_location)
+    items = await db.get_items_by_storage(storage_location)
     
     # Return the rendered table
-    return render_items_table(items, storage_location)
\ No newline at end of file
+    return render_items_table(items, storage_location), *etag_headers(etag)
\ No newline at end of file
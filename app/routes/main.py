@@ -5,15 +5,15 @@ from components.navigation import BottomNav
 from db.auth import AuthDatabase
 from layout.navigation import render_main_navigation
 
+auth_db = AuthDatabase()
+
 @rt('/')
-def home(session):
+async def home(session):
     """Home page with role-based navigation"""
     if not session.get('user'):
         return RedirectResponse('/login', status_code=303)
         
-    auth_db = AuthDatabase()
-    user_id = session['user']['id']
-    user_role = auth_db.get_user_role(user_id)
+    user_role = await auth_db.resolve_user_role(session['user'])
     
     return AppContainer(
         Div(cls="container mx-auto p-4 max-w-4xl")(
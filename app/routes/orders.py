@@ -15,10 +15,13 @@ import json
 from components.dropdown import Dropdown
 from components.icon import Icon
 from db.inventory_db import InventoryDatabase
+from core.concurrency import gather_limited
+from core.conditional import view_etag, etag_matches, etag_headers, not_modified
 
 logger = logging.getLogger(__name__)
 order_db = OrderDatabase()
 inventory_db = InventoryDatabase()
+auth_db = AuthDatabase()
 
 @rt('/orders/search-items', methods=['POST'])
 async def search_inventory_items(request, session):
@@ -29,9 +32,8 @@ async def search_inventory_items(request, session):
     
     try:
         # Get draft order for branch if exists
-        auth_db = AuthDatabase()
-        branch_id = auth_db.get_user_branch(session)
-        draft_order = order_db.get_draft_order(branch_id)
+        branch_id = await auth_db.resolve_user_branch(session['user'])
+        draft_order = await order_db.get_draft_order(branch_id)
         
         # Process search query
         form = await request.form()
@@ -40,7 +42,7 @@ async def search_inventory_items(request, session):
         if len(query) < 2:
             return ""  # Return empty for short queries
             
-        items = inventory_db.search_items(query)
+        items = await inventory_db.search_items(query)
         
         if not items:
             return Div(
@@ -62,15 +64,14 @@ async def start_order(session):
     if not session.get('user'):
         return RedirectResponse('/login', status_code=303)
     
-    auth_db = AuthDatabase()
-    branch_id = auth_db.get_user_branch(session)
+    branch_id = await auth_db.resolve_user_branch(session['user'])
     user_id = session['user']['id']
     
     # Check if draft already exists
-    if order_db.get_draft_order(branch_id):
+    if await order_db.get_draft_order(branch_id):
         return RedirectResponse('/orders', status_code=303)
         
-    order = order_db.create_order(branch_id, user_id)
+    order = await order_db.create_order(branch_id, user_id)
     return RedirectResponse(f'/orders/{order.id}', status_code=303)
 
 @rt('/orders/draft/items', methods=['POST'])
@@ -81,13 +82,12 @@ async def add_draft_item(request, session):
         
     try:
         # Get or create draft order
-        auth_db = AuthDatabase()
-        branch_id = auth_db.get_user_branch(session)
+        branch_id = await auth_db.resolve_user_branch(session['user'])
         
-        draft_order = order_db.get_draft_order(branch_id)
+        draft_order = await order_db.get_draft_order(branch_id)
         if not draft_order:
             # Create new draft order if none exists
-            draft_order = order_db.create_order(branch_id, session['user']['id'])
+            draft_order = await order_db.create_order(branch_id, session['user']['id'])
         
         # Parse request data
         try:
@@ -102,7 +102,7 @@ async def add_draft_item(request, session):
             }
         
         # Add item to order
-        order_item = order_db.add_order_item(
+        order_item = await order_db.add_order_item(
             order_id=draft_order.id,
             product_name=data.get('product_name'),  # Use get() for safety
             product_id=data['product_id'],
@@ -115,7 +115,7 @@ async def add_draft_item(request, session):
             return Response("Failed to add item", status_code=500)
             
         # Return updated items list
-        updated_order = order_db.get_order_info(draft_order.id)
+        updated_order = await order_db.get_order_info(draft_order.id)
         print(f"Updated order: {updated_order.items[-1]}")
         return Div(cls="space-y-4", id="order-items-list")(
             *[render_order_item(updated_order, item) for item in updated_order.items]
@@ -131,7 +131,7 @@ async def update_order_type(order_id: str, type: str = Form(...)):
     try:
         # Update order type
         new_type = OrderType(type)
-        updated = order_db.update_order_type(order_id, new_type)
+        updated = await order_db.update_order_type(order_id, new_type)
         
         if not updated:
             return Response("Failed to update order type", status_code=500)
@@ -154,7 +154,7 @@ async def update_order_type(order_id: str, type: str = Form(...)):
 @rt('/orders/{order_id}/type-selector')
 async def type_selector(order_id: str):
     """Render order type selector dropdown menu"""
-    order = order_db.get_order_info(order_id)
+    order = await order_db.get_order_info(order_id)
     if not order:
         return Response(status_code=404)
     
@@ -182,10 +182,9 @@ async def type_selector(order_id: str):
 async def view_order(order_id: str, session):
     """View or continue a draft order"""
     # Verify user has access to this order
-    auth_db = AuthDatabase()
-    user_branch = auth_db.get_user_branch(session)
+    user_branch = await auth_db.resolve_user_branch(session['user'])
     
-    order = order_db.get_order_info(order_id)
+    order = await order_db.get_order_info(order_id)
     if not order or order.branch_id != user_branch:
         return RedirectResponse('/orders', status_code=303)
     
@@ -208,17 +207,16 @@ async def delete_draft(order_id: str, session):
     """Delete a draft order"""
     try:
         # Verify user has access to this order
-        auth_db = AuthDatabase()
-        user_branch = auth_db.get_user_branch(session)
+        user_branch = await auth_db.resolve_user_branch(session['user'])
         
-        order = order_db.get_order_info(order_id)
+        order = await order_db.get_order_info(order_id)
         if not order or order.branch_id != user_branch:
             return Response(status_code=403)
             
         if order.status != OrderStatus.DRAFT:
             return Response("Only draft orders can be deleted", status_code=400)
             
-        success = order_db.delete_order(order_id)
+        success = await order_db.delete_order(order_id)
         if success:
             logger.info(f"Deleted draft order {order_id}")
             return Response(
@@ -233,21 +231,29 @@ async def delete_draft(order_id: str, session):
         return Response(str(e), status_code=500)
 
 @rt('/orders')
-async def orders_page(session):
+async def orders_page(req, session):
     """Render the orders page with all branch orders and draft order if exists"""
     if not session.get('user'):
         return RedirectResponse('/login', status_code=303)
     
-    auth_db = AuthDatabase()
-    user_id = session['user']['id']
-    user_is_admin = auth_db.is_admin(user_id)
-    branch_id = auth_db.get_user_branch(session)
+    user_is_admin, branch_id = await gather_limited(
+        auth_db.resolve_is_admin(session['user']),
+        auth_db.resolve_user_branch(session['user'])
+    )
+
+    etag = await view_etag(req, order_db.get_branch_orders_version(branch_id), branch_id, user_is_admin)
+    if etag_matches(req, etag):
+        return not_modified(etag)
     
-    orders = order_db.get_branch_orders(branch_id)
-    draft_order = None if user_is_admin else order_db.get_draft_order(branch_id)
+    # Drafts are only shown to non-admins; fetch them alongside the order list
+    lookups = [order_db.get_branch_orders(branch_id)]
+    if not user_is_admin:
+        lookups.append(order_db.get_draft_order(branch_id))
+    orders, *draft = await gather_limited(*lookups)
+    draft_order = draft[0] if draft else None
 
     return OrdersPage(
         orders=orders,
         draft_order=draft_order,
         is_admin=user_is_admin
-    )
\ No newline at end of file
+    ), *etag_headers(etag)
\ No newline at end of file
@@ -1,30 +1,50 @@
 from core.app import rt
 from fasthtml.common import *
 from db.task_db import TaskDatabase
+from db.auth import AuthDatabase
 from models.task import Task, Subtask, TaskHistory
-from layout.tasks import (
-    task_checkbox,
-    subtask_checkbox,
-)
 from layout.pages import TasksPage
 from uuid import uuid4
 from starlette.requests import Request
 from sse_starlette.sse import EventSourceResponse
-from core.sse_manager import sse_manager
+from starlette.background import BackgroundTask
+from core.sse_manager import sse_manager, task_topic, TASKS_TOPIC, CLOSE, RESYNC_EVENT, TooManyStreams
+from core.coalesce import Coalescer
+from core.fragments import render_fragment
+from core.conditional import view_etag, etag_matches, etag_headers, not_modified
+from core.config import settings
 import asyncio
+from typing import List
 
 db = TaskDatabase()
+auth_db = AuthDatabase()
+
+async def save_note(task_id: str, note: str):
+    """Write the latest note of a typing burst and broadcast it once"""
+    try:
+        task = await db.update_task_notes(task_id, note)
+    except Exception:
+        # The update request was already answered, so tell the open pages to reload the stored note
+        await sse_manager.publish([RESYNC_EVENT], [TASKS_TOPIC, task_topic(task_id)])
+        raise
+    await sse_manager.broadcast_task_update(task, "task_note")
+
+# Keystroke posts from task_note_form collapse into one write per window
+note_updates = Coalescer(save_note, settings.NOTE_COALESCE_WINDOW)
 
 @rt('/tasks')
-async def tasks_page():
+async def tasks_page(req):
     '''Main tasks page'''
-    tasks = db.get_tasks()
-    return TasksPage(tasks)
+    etag = await view_etag(req, db.get_tasks_version())
+    if etag_matches(req, etag):
+        return not_modified(etag)
+    tasks = await db.get_tasks()
+    return TasksPage(tasks), *etag_headers(etag)
 
 @rt('/tasks/{task_id}/toggle', methods=['POST'])
 async def toggle_task(session, task_id: str):
     '''Toggle task completion status'''
-    task = db.get_task(task_id)
+    task = await db.get_task(task_id)
     if not task:
         return 'Task not found', 404
     
@@ -42,12 +62,12 @@ async def toggle_task(session, task_id: str):
                 user_id=session['user']['id']
             )
     
-    success = db.update_task(task)
+    # Only the changed documents are written, alongside the history entry
+    success = await db.update_task(task, [history])
     if success:
-        db.add_history(history)
         # Broadcast update to all connected clients
         await sse_manager.broadcast_task_update(task, "task_status")
-        return task_checkbox(task)
+        return render_fragment("task_checkbox", task)
     return 'Failed to update task', 500
 
 @rt('/tasks/subtask/{subtask_id}/toggle', methods=['POST'])
@@ -55,7 +75,7 @@ async def toggle_subtask(req, session, subtask_id: str):
     '''Toggle subtask completion status and update parent task if needed'''
     data = await req.form()
     task_id = data['task_id']
-    task = db.get_task(task_id)
+    task = await db.get_task(task_id)
     if not task:
         return 'Task not found', 404
     
@@ -101,26 +121,23 @@ async def toggle_subtask(req, session, subtask_id: str):
             )
         )
     
-    # Update database
-    success = db.update_task(task)
+    # Update database: the subtask, the parent only if its status flipped, and the history entries
+    success = await db.update_task(task, histories)
     if not success:
         return 'Failed to update task', 500
-
-    for history in histories:
-        db.add_history(history)
     
     # Broadcast update to all connected clients
     await sse_manager.broadcast_task_update(task, "subtask_status", subtask_id)
     
-    # Return the updated subtask checkbox
-    return subtask_checkbox(subtask)
+    # Return the updated subtask checkbox, already rendered for the broadcast
+    return render_fragment("subtask_checkbox", subtask)
 
 @rt('/tasks/{task_id}/note', methods=['POST'])
 async def update_task_note(req, session, task_id: str):
     '''Update task note'''
     data = await req.form()
     note = data['note'].strip()
-    task =  db.get_task(task_id)
+    task =  await db.get_task(task_id)
     if not task:
         return 'Task not found', 404
     
@@ -133,43 +150,61 @@ async def update_task_note(req, session, task_id: str):
     )
     
     # Update database
-    success =  db.update_task(task)
+    success =  await db.update_task(task, [history])
     if success:
-        db.add_history(history)
         return 'Note updated'
     return 'Failed to update note', 500
 
 @rt("/tasks/{task_id}/notes/update", methods=["POST"])
 async def update_note(request: Request, task_id: str):
-    """Update task note"""
-    print(f"Received note update request for task {task_id}")
+    """Queue a task note update; only the latest note per task is written"""
     form = await request.form()
     note = form.get("note", "")
-    
-    task = db.get_task(task_id)
-    if not task:
+    # Checked up front because the write itself happens after this response
+    if not await db.task_exists(task_id):
         return "Task not found", 404
-    
-    # Update task notes
-    task.notes = note
-    success = db.update_task(task)
-    
-    if success:
-        # Broadcast note update to all connected clients
-        await sse_manager.broadcast_task_update(task, "task_note")
-        return "OK"
-    return "Failed to update note for task {task_id}", 500
+    note_updates.submit(task_id, note)
+    return "OK"
+
+async def snapshot_tasks(topics: List[str]) -> List[Task]:
+    """Tasks a stream subscribed to the given topics is showing"""
+    tasks = await db.get_tasks()
+    if TASKS_TOPIC in topics:
+        return tasks
+    return [task for task in tasks if task_topic(task.id) in topics]
 
 @rt("/tasks/stream")
-async def stream_tasks():
-    """Single SSE endpoint for all task updates"""
+async def stream_tasks(request: Request, session):
+    """SSE endpoint for task updates; ?topic=task:<id> narrows it to specific tasks"""
+    topics = request.query_params.getlist("topic") or [TASKS_TOPIC]
+    last_event_id = request.headers.get("last-event-id") or request.query_params.get("last_event_id")
+    user_id = session.get("user", {}).get("id")
+    try:
+        # Connect up front so the cap can be answered with a status code; a
+        # non-200 response stops EventSource from retrying
+        queue = sse_manager.connect(topics, user_id=user_id)
+    except TooManyStreams as e:
+        return Response(str(e), status_code=429)
+
     async def event_generator():
-        queue = asyncio.Queue()
-        sse_manager.add_connection(queue)
-        
         try:
+            if last_event_id:
+                # Catch a reconnecting client up before live events
+                missed = sse_manager.missed_events(queue, last_event_id)
+                if missed is None:
+                    missed = sse_manager.snapshot_events(await snapshot_tasks(topics))
+                for event in missed:
+                    yield event
+
             while True:
-                event = await queue.get()
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=settings.SSE_IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    # Reap streams nobody has needed for a while; live tabs reconnect and replay
+                    sse_manager.metrics["idle_closed"] += 1
+                    break
+                if event is CLOSE:
+                    break
                 yield event
         except asyncio.CancelledError:
             pass
@@ -178,9 +213,20 @@ async def stream_tasks():
     
     return EventSourceResponse(
         event_generator(),
-        media_type="text/event-stream"
+        media_type="text/event-stream",
+        # Heartbeat comments keep proxies from timing out quiet streams and surface dead clients
+        ping=settings.SSE_HEARTBEAT_INTERVAL,
+        # Also covers a client that goes away before the generator first runs
+        background=BackgroundTask(sse_manager.remove_connection, queue)
     )
 
+@rt("/tasks/stream/stats")
+async def stream_stats(session):
+    """Connection and throughput figures for sizing the deployment (admins only)"""
+    if not await auth_db.resolve_is_admin(session["user"]):
+        return "Forbidden", 403
+    return sse_manager.stats()
+
 @rt('/tasks/{task_id}/subtasks', methods=['POST'])
 async def add_subtask(req, task_id: str):
     '''Add new subtask to task'''
@@ -188,7 +234,7 @@ async def add_subtask(req, task_id: str):
     if not title:
         return 'Title required', 400
     
-    task =  db.get_task(task_id)
+    task =  await db.get_task(task_id)
     if not task:
         return 'Task not found', 404
     
@@ -204,7 +250,7 @@ async def add_subtask(req, task_id: str):
     task.subtasks.append(new_subtask)
     
     # Update database
-    success =  db.update_task(task)
+    success =  await db.update_task(task)
     if success:
         return subtask_container(new_subtask)
     return 'Failed to add subtask', 500
\ No newline at end of file
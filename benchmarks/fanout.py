@@ -0,0 +1,113 @@
+"""
+Latency of the routes that fan out Appwrite calls, against a mock Appwrite.
+
+Every Appwrite request is answered by an in-process httpx MockTransport
+after a fixed delay, so the timings measure how many round trips a handler
+waits for in sequence. Each route is timed cold (empty caches) twice: with
+APPWRITE_FANOUT_LIMIT=1, which makes gather_limited run calls one after
+another, and with the configured limit.
+
+Run from the repository root:
+
+    python benchmarks/fanout.py [--latency 0.1]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'app'))
+
+from core import appwrite_client  # noqa: E402
+from core.config import settings  # noqa: E402
+
+ITEM = {'$id': 'i1', 'name': 'Rice', 'quantity': 5, 'primary_unit': 'kg', 'branch': 'Plano',
+        'storage': 'kitchen', 'last_updated': '2024-01-01T00:00:00', '$updatedAt': '2024-01-01T00:00:00'}
+UNIT = {'$id': 'u1', 'item_id': 'i1', 'unit_name': 'bag', 'conversion_to_primary': 10,
+        'last_updated': '2024-01-01T00:00:00'}
+ORDER = {'$id': 'o1', 'branch_id': 'b1', 'status': 'draft', 'type': 'regular', 'created_by': 'u',
+         'created_at': '2024-01-01T00:00:00', '$updatedAt': '2024-01-01T00:00:00'}
+
+
+def documents(docs: list) -> httpx.Response:
+    return httpx.Response(200, json={'total': len(docs), 'documents': docs})
+
+
+def mock_transport(latency: float, calls: list) -> httpx.MockTransport:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(f"{request.method} {request.url.path}")
+        await asyncio.sleep(latency)
+        path = request.url.path
+        if path.startswith('/v1/users/'):
+            return httpx.Response(200, json={'$id': 'u', 'labels': []})
+        if path == '/v1/teams':
+            return httpx.Response(200, json={'total': 1, 'teams': [{'$id': 'b1', 'name': 'b1'}]})
+        if path.endswith('/collections/orders/documents'):
+            return documents([ORDER])
+        if path.endswith('/collections/order_items/documents'):
+            return documents([])
+        if path.endswith('/collections/inventory/documents'):
+            return documents([ITEM])
+        if path.endswith('/collections/inventory/documents/i1'):
+            if request.method == 'PATCH':
+                return httpx.Response(200, json={**ITEM, 'quantity': 25})
+            return httpx.Response(200, json=ITEM)
+        if path.endswith('/collections/item_units/documents'):
+            return documents([UNIT])
+        return httpx.Response(201, json={'$id': 'x'})
+
+    return httpx.MockTransport(handler)
+
+
+class FormRequest:
+    """The parts of a Starlette request the handlers use"""
+
+    headers: dict = {}
+
+    async def form(self) -> dict:
+        return {'quantity': '2', 'unit': 'bag', 'storage': 'kitchen'}
+
+
+def clear_caches() -> None:
+    import db.auth
+    import db.inventory_db
+    from models.inventory import UnitConversionIndex
+    for cache in (db.auth._user_cache, db.auth._branch_cache,
+                  db.inventory_db._item_cache, db.inventory_db._unit_cache):
+        cache.clear()
+    db.inventory_db._unit_index = UnitConversionIndex(ttl=settings.UNIT_INDEX_TTL)
+
+
+async def main(latency: float) -> None:
+    calls: list = []
+    appwrite_client._http_client = httpx.AsyncClient(transport=mock_transport(latency, calls))
+    import routes.orders
+    import routes.inventory
+
+    session = {'user': {'id': 'u', 'email': 'e'}}
+    cases = [
+        ('/orders', lambda: routes.orders.orders_page(FormRequest(), session)),
+        ('/inventory/update/i1', lambda: routes.inventory.update_inventory(FormRequest(), session, 'i1')),
+    ]
+    fanout_limit = settings.APPWRITE_FANOUT_LIMIT
+    print(f"Mock Appwrite latency {latency * 1000:.0f} ms per call")
+    for name, handler in cases:
+        timings = []
+        for limit in (1, fanout_limit):
+            settings.APPWRITE_FANOUT_LIMIT = limit
+            clear_caches()
+            calls.clear()
+            start = time.perf_counter()
+            await handler()
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"  {name:<24} sequential {timings[0]:5.0f} ms -> fan-out {timings[1]:5.0f} ms ({len(calls)} calls)")
+    settings.APPWRITE_FANOUT_LIMIT = fanout_limit
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.1, help='seconds added to every Appwrite call')
+    asyncio.run(main(parser.parse_args().latency))
@@ -0,0 +1,22 @@
+/** Purged stylesheet for the app: npm run build:css -> app/assets/build/app.css */
+module.exports = {
+  // Class names are string literals in the FastHTML components, so scanning
+  // the Python sources (and the few scripts that toggle classes) is enough.
+  content: [
+    './app/layout/**/*.py',
+    './app/components/**/*.py',
+    './app/routes/**/*.py',
+    './app/auth/**/*.py',
+    './app/core/**/*.py',
+    './app/assets/**/*.js',
+  ],
+  theme: {
+    extend: {},
+  },
+  plugins: [require('daisyui')],
+  daisyui: {
+    // AppContainer only ever sets data-theme="cupcake"
+    themes: ['cupcake'],
+    logs: false,
+  },
+};